@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import importlib.util
 import json
 import os
+import tempfile
 from typing import List
 
 from checksumdir import dirhash
@@ -50,6 +52,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'releases',
 ]
 
 MIDDLEWARE = [
@@ -93,6 +96,32 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+# the uwsgi module is importable only in processes run by uWSGI
+CACHE_BACKEND = get_environment('CACHE_BACKEND', default='uwsgi' if importlib.util.find_spec('uwsgi') else 'memory')
+CACHE_MAX_BYTES = get_environment('CACHE_MAX_BYTES', mapper=int, default=64 * 1024 * 1024)
+
+CACHES = {
+    'default': {
+        'memory': {
+            'BACKEND': 'releases.cache_backends.BoundedMemoryCache',
+            'OPTIONS': {
+                'MAX_BYTES': CACHE_MAX_BYTES,
+            },
+        },
+        'uwsgi': {
+            'BACKEND': 'releases.cache_backends.UWSGICache',
+            'LOCATION': 'release-manager',
+            'OPTIONS': {
+                'STATS_ADDRESS': '/run/uwsgi-stats.sock',
+            },
+        },
+    }[CACHE_BACKEND],
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -136,14 +165,45 @@ STATIC_URL = f'/static/{dirhash(STATICFILES_DIRS[0])}/'
 
 GITLAB_HOST = get_environment('GITLAB_HOST')
 GITLAB_PRIVATE_TOKEN = get_environment('GITLAB_PRIVATE_TOKEN')
+GITLAB_WEBHOOK_SECRET_TOKEN = get_environment('GITLAB_WEBHOOK_SECRET_TOKEN', default=None)
+GITLAB_REF_CACHE_TTL = get_environment('GITLAB_REF_CACHE_TTL', mapper=int, default=0)
+GITLAB_TAG_INDEX_TTL = get_environment('GITLAB_TAG_INDEX_TTL', mapper=int, default=300)
+GITLAB_COMPARE_MAX_BYTES = get_environment('GITLAB_COMPARE_MAX_BYTES', mapper=int, default=1024 * 1024)
+GITLAB_ENGINE = get_environment('GITLAB_ENGINE', default='api')
+GITLAB_MIRROR_URL = get_environment('GITLAB_MIRROR_URL', default='{host}/{gitlab_id}.git')
+GITLAB_MIRROR_FETCH_INTERVAL = get_environment('GITLAB_MIRROR_FETCH_INTERVAL', mapper=int, default=60)
 
 JIRA_HOST = get_environment('JIRA_HOST')
 JIRA_USERNAME = get_environment('JIRA_USERNAME')
 JIRA_PASSWORD = get_environment('JIRA_PASSWORD')
 JIRA_PROJECTS = get_environment('JIRA_PROJECTS', mapper=list_mapper_factory())
+JIRA_ISSUE_TTL = get_environment('JIRA_ISSUE_TTL', mapper=int, default=300)
+JIRA_ENGINE = get_environment('JIRA_ENGINE', default='api')
+JIRA_TRANSITION_TTL = get_environment('JIRA_TRANSITION_TTL', mapper=int, default=3600)
 
 ROCKET_HOOK_URL = get_environment('ROCKET_HOOK_URL', default=None)
 
+STORAGE_DIR = get_environment('STORAGE_DIR', default=os.path.join(tempfile.gettempdir(), 'release-manager'))
+
+EXECUTOR_MAX_WORKERS = get_environment('EXECUTOR_MAX_WORKERS', mapper=int, default=16)
+EXECUTOR_REQUEST_CONCURRENCY = get_environment('EXECUTOR_REQUEST_CONCURRENCY', mapper=int, default=8)
+
+HTTP_POOL_SIZE = get_environment('HTTP_POOL_SIZE', mapper=int, default=EXECUTOR_MAX_WORKERS)
+HTTP_RATE_LIMIT = get_environment('HTTP_RATE_LIMIT', mapper=float, default=0)
+HTTP_RATE_BURST = get_environment('HTTP_RATE_BURST', mapper=int, default=10)
+HTTP_MAX_RETRIES = get_environment('HTTP_MAX_RETRIES', mapper=int, default=3)
+HTTP_MAX_RETRY_DELAY = get_environment('HTTP_MAX_RETRY_DELAY', mapper=int, default=60)
+HTTP_CONNECT_TIMEOUT = get_environment('HTTP_CONNECT_TIMEOUT', mapper=float, default=5)
+HTTP_READ_TIMEOUT = get_environment('HTTP_READ_TIMEOUT', mapper=float, default=20)
+
+CIRCUIT_BREAKER_FAILURES = get_environment('CIRCUIT_BREAKER_FAILURES', mapper=int, default=5)
+CIRCUIT_BREAKER_RESET_TIMEOUT = get_environment('CIRCUIT_BREAKER_RESET_TIMEOUT', mapper=int, default=30)
+
+SNAPSHOT_REFRESH_INTERVAL = get_environment('SNAPSHOT_REFRESH_INTERVAL', mapper=int, default=60)
+
+DASHBOARD_RENDERING = get_environment('DASHBOARD_RENDERING', default='streaming')
+DASHBOARD_TIME_BUDGET = get_environment('DASHBOARD_TIME_BUDGET', mapper=float, default=5)
+
 def load_projects(raw: str) -> List[Project]:
     data = json.loads(raw)
     projects = []
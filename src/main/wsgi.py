@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
 application = get_wsgi_application()
+
+from releases.post_deployment import resume_post_deployment_jobs  # noqa: E402 pylint: disable=wrong-import-position
+from releases.snapshots import start_snapshot_refresher  # noqa: E402 pylint: disable=wrong-import-position
+
+start_snapshot_refresher()
+resume_post_deployment_jobs()
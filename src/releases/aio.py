@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import logging
+import threading
+import urllib.parse
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Awaitable,
+    Iterable,
+    List,
+    Optional,
+)
+
+import aiohttp
+
+from django.conf import settings
+
+from .circuit_breaker import (
+    get_base_url,
+    get_circuit_breaker,
+    get_timeout,
+)
+from .executor import register_shutdown
+from .throttling import (
+    Priority,
+    get_host_throttle,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread(threading.Thread):
+
+    """A thread running the asyncio event loop of the process, with an HTTP client session shared by all coroutines run in it.
+
+    Other threads submit whole batches of requests as a single coroutine and wait for its result, so a batch takes a single blocked
+    thread instead of a thread per request.
+    """
+
+    def __init__(self):
+        super().__init__(name='releases-event-loop', daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine: Awaitable) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run_coroutine(self, coroutine: Awaitable) -> Any:
+        """Run the coroutine in the event loop and wait for its result, never to be called from the event loop thread itself"""
+        return self.submit(coroutine).result()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Return the HTTP client session, which can be used only in the event loop"""
+        if self._session is None:
+            connect_timeout, read_timeout = get_timeout()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=settings.HTTP_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            )
+        return self._session
+
+    def stop(self):
+        if self._session is not None:
+            self.submit(self._session.close()).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_event_loop_thread: Optional[EventLoopThread] = None
+_event_loop_thread_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    global _event_loop_thread  # pylint: disable=global-statement
+    if _event_loop_thread is None:
+        with _event_loop_thread_lock:
+            if _event_loop_thread is None:
+                _event_loop_thread = EventLoopThread()
+                _event_loop_thread.start()
+                register_shutdown(_event_loop_thread.stop)
+    return _event_loop_thread
+
+
+def run_coroutine(coroutine: Awaitable) -> Any:
+    return get_event_loop_thread().run_coroutine(coroutine)
+
+
+def run_coroutines(coroutines: Iterable[Awaitable]) -> List[Any]:
+    """Run the coroutines concurrently in the event loop and wait for their results, in the same order"""
+    async def gather():
+        return await asyncio.gather(*coroutines)
+
+    return run_coroutine(gather())
+
+
+async def send_request(method: str, url: str, priority: Priority, **kwargs) -> aiohttp.ClientResponse:
+    """Send a request from the event loop through the circuit breaker and the throttle of its host like HTTP sessions do, see http,
+    returning it with its body read
+    """
+    throttle = get_host_throttle(urllib.parse.urlsplit(url).netloc)
+    circuit_breaker = get_circuit_breaker(get_base_url(url))
+    for attempt in itertools.count():
+        circuit_breaker.check()
+        await throttle.acquire_async(priority)
+        try:
+            async with get_event_loop_thread().session.request(method, url, **kwargs) as response:
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            circuit_breaker.record(success=False)
+            raise
+        finally:
+            throttle.release()
+        circuit_breaker.record(success=response.status < 500 or 'Retry-After' in response.headers)
+        if not throttle.observe(method, response.status, response.headers, attempt):
+            return response
+        logger.warning('Got %s from %s, sending %s %s again', response.status, throttle.host, method, response.url.path)
@@ -0,0 +1,79 @@
+import threading
+from collections import (
+    Counter,
+    defaultdict,
+)
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+)
+
+from django.core.cache import (
+    DEFAULT_CACHE_ALIAS,
+    caches,
+)
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def record(namespace: str, event: str, count: int = 1):
+    with _stats_lock:
+        _stats[namespace][event] += count
+
+
+def record_eviction(cache_key: str):
+    """Count an eviction of a key made by the cache backend, ie. prefixed with the key prefix and version"""
+    key = cache_key.split(':', 2)[-1]
+    record(key.split(':', 1)[0], 'evictions')
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {namespace: dict(counter) for namespace, counter in _stats.items()}
+
+
+def get_backend_stats(alias: str = DEFAULT_CACHE_ALIAS) -> Dict[str, int]:
+    """Return the size and evictions of the whole cache, as reported by backends of cache_backends"""
+    backend = caches[alias]
+    return backend.get_stats() if hasattr(backend, 'get_stats') else {}
+
+
+class NamespacedCache:
+
+    """A view of a Django cache that keeps all its keys under a namespace and counts hits and misses of the namespace."""
+
+    def __init__(self, namespace: str, alias: str = DEFAULT_CACHE_ALIAS):
+        self.namespace = namespace
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def make_key(self, key: str) -> str:
+        return f'{self.namespace}:{key}'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.backend.get(self.make_key(key), default)
+        record(self.namespace, 'misses' if value is default else 'hits')
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys_by_cache_key = {self.make_key(key): key for key in keys}
+        values = self.backend.get_many(keys_by_cache_key)
+        record(self.namespace, 'hits', len(values))
+        record(self.namespace, 'misses', len(keys_by_cache_key) - len(values))
+        return {keys_by_cache_key[cache_key]: value for cache_key, value in values.items()}
+
+    def set(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT):
+        self.backend.set(self.make_key(key), value, timeout)
+
+    def add(self, key: str, value: Any, timeout: Any = DEFAULT_TIMEOUT) -> bool:
+        return self.backend.add(self.make_key(key), value, timeout)
+
+    def delete(self, key: str):
+        self.backend.delete(self.make_key(key))
@@ -0,0 +1,225 @@
+import json
+import pickle
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+)
+
+from django.core.cache.backends.base import (
+    DEFAULT_TIMEOUT,
+    BaseCache,
+)
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import record_eviction
+
+
+class _MemoryStore:
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+
+_memory_stores: Dict[str, _MemoryStore] = {}
+_memory_stores_lock = threading.Lock()
+
+
+class BoundedMemoryCache(BaseCache):
+
+    """An in-process LRU cache bounded by the total size of pickled values.
+
+    Meant for development and tests, where the shared uWSGI cache is not available. Django creates a backend instance per thread, so
+    the entries are kept in a store shared by all instances of the same LOCATION.
+    """
+
+    def __init__(self, name: str, params: dict):
+        super().__init__(params)
+        self._max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 64 * 1024 * 1024))
+        with _memory_stores_lock:
+            self._store = _memory_stores.setdefault(name, _MemoryStore())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            if self._get_entry(key) is not None:
+                return False
+            self._set_entry(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.get_backend_timeout(timeout))
+            return True
+
+    def get(self, key, default=None, version=None) -> Any:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            entry = self._get_entry(key)
+        if entry is None:
+            return default
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._store.lock:
+            self._set_entry(key, pickled, self.get_backend_timeout(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self.make_key(key, version=version)
+        with self._store.lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return False
+            self._store.entries[key] = (entry[0], self.get_backend_timeout(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            self._delete_entry(key)
+
+    def has_key(self, key, version=None) -> bool:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            return self._get_entry(key) is not None
+
+    def clear(self):
+        with self._store.lock:
+            self._store.entries.clear()
+            self._store.size = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._store.lock:
+            return {'items': len(self._store.entries), 'bytes': self._store.size, 'max_bytes': self._max_bytes}
+
+    def _get_entry(self, key: str):
+        entry = self._store.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            self._delete_entry(key)
+            return None
+        self._store.entries.move_to_end(key)
+        return entry
+
+    def _set_entry(self, key: str, pickled: bytes, expires_at):
+        self._delete_entry(key)
+        if len(pickled) > self._max_bytes:
+            return
+        self._store.entries[key] = (pickled, expires_at)
+        self._store.size += len(pickled)
+        while self._store.size > self._max_bytes:
+            evicted_key, (evicted_pickled, _) = self._store.entries.popitem(last=False)
+            self._store.size -= len(evicted_pickled)
+            record_eviction(evicted_key)
+
+    def _delete_entry(self, key: str):
+        entry = self._store.entries.pop(key, None)
+        if entry is not None:
+            self._store.size -= len(entry[0])
+
+
+class UWSGICache(BaseCache):
+
+    """A cache kept in a uWSGI cache2 store, shared by all workers of the uWSGI instance.
+
+    The store (its name being the cache LOCATION) bounds the memory and evicts least recently used items itself, eg.::
+
+        cache2 = name=release-manager,items=20000,blocksize=4096,bitmap=1,purge_lru=1,ignore_full=1
+
+    uWSGI does not tell which items it evicts, so evictions are counted for the whole store rather than per namespace, by reading
+    the ``full`` counter of the store from the uWSGI stats server at the STATS_ADDRESS option, a socket path or ``host:port``.
+    """
+
+    STATS_TIMEOUT = 1
+
+    def __init__(self, name: str, params: dict):
+        super().__init__(params)
+        try:
+            import uwsgi
+        except ImportError:
+            raise ImproperlyConfigured('The uWSGI cache backend can be used only when running under uWSGI.')
+        self._uwsgi = uwsgi
+        self._cache_name = name
+        self._stats_address = params.get('OPTIONS', {}).get('STATS_ADDRESS')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._uwsgi.cache_set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._get_expires(timeout), self._cache_name))
+
+    def get(self, key, default=None, version=None) -> Any:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = self._uwsgi.cache_get(key, self._cache_name)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._uwsgi.cache_update(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._get_expires(timeout), self._cache_name)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        value = self.get(key, version=version)
+        if value is None:
+            return False
+        self.set(key, value, timeout=timeout, version=version)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._uwsgi.cache_del(key, self._cache_name)
+
+    def has_key(self, key, version=None) -> bool:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._uwsgi.cache_exists(key, self._cache_name))
+
+    def clear(self):
+        self._uwsgi.cache_clear(self._cache_name)
+
+    def get_stats(self) -> Dict[str, int]:
+        if not self._stats_address:
+            return {}
+        try:
+            stats = self._read_stats()
+        except (OSError, ValueError):
+            return {}
+        cache_stats = next((c for c in stats.get('caches', []) if c.get('name') == self._cache_name), {})
+        return {
+            'items': cache_stats.get('items', 0),
+            'max_items': cache_stats.get('max_items', 0),
+            'evictions': cache_stats.get('full', 0),
+        }
+
+    def _read_stats(self) -> dict:
+        if ':' in self._stats_address:
+            host, port = self._stats_address.rsplit(':', 1)
+            connection = socket.create_connection((host, int(port)), timeout=self.STATS_TIMEOUT)
+        else:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.STATS_TIMEOUT)
+            connection.connect(self._stats_address)
+        with connection:
+            chunks = []
+            for chunk in iter(lambda: connection.recv(65536), b''):
+                chunks.append(chunk)
+        return json.loads(b''.join(chunks).decode())
+
+    def _get_expires(self, timeout) -> int:
+        """Return the expiration in seconds, uWSGI treating 0 as never"""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return 0
+        return max(1, int(timeout))
@@ -0,0 +1,51 @@
+from typing import (
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from unstdlib import listify
+
+from .domain.branch_difference import BranchDifference
+from .domain.changes import Change
+from .domain.jira import JiraIssue
+from .domain.projects import Project
+from .executor import TaskBatch
+from .gitlab import GitlabClient
+from .jira import JiraClient
+
+
+class ChangesGettingMixin:
+
+    def get_changes(self, project: Project, source: str, target: str) -> List[Change]:
+        return self.get_many_changes(project, [(source, target)])[0]
+
+    def get_many_changes(self, project: Project, ranges: List[Tuple[str, str]], batch: Optional[TaskBatch] = None) -> List[List[Change]]:
+        """Return changes between ``(source, target)`` pairs of refs, looking up Jira issues of all the ranges at once"""
+        gitlab_client = GitlabClient()
+        differences = gitlab_client.compare_many_refs(project, ranges, batch)
+        jira_references = {
+            commit.jira_reference
+            for difference in differences if difference.has_diff
+            for commit in difference.commit_log if commit.jira_reference
+        }
+        jira_issues = JiraClient().get_issues(jira_references) if jira_references else {}
+        return [self.make_changes(project, difference, jira_issues) for difference in differences]
+
+    @listify
+    def make_changes(
+        self,
+        project: Project,
+        difference: BranchDifference,
+        jira_issues: Dict[str, Optional[JiraIssue]],
+    ) -> Generator[Change, None, None]:
+        if difference.has_diff:
+            for commit in difference.commit_log:
+                jira_issue = jira_issues.get(commit.jira_reference) if commit.jira_reference else None
+                yield Change(
+                    commit=commit,
+                    jira_issue=jira_issue,
+                    warning_labels=list(set(project.jira_warning_labels) & set(jira_issue.labels if jira_issue else [])),
+                )
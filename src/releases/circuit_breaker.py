@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    Optional,
+)
+
+import requests
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+
+    """Fails requests of the process to a single host at once while the host keeps failing.
+
+    The circuit opens after ``failure_threshold`` consecutive failures, that is errors of the connection, timeouts and 5xx responses.
+    While it is open, requests to the host raise CircuitOpenError without being sent, and a background thread probes the host every
+    ``reset_timeout`` seconds (half-open). The first answer of the host below 500 closes the circuit again.
+    """
+
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half-open'
+
+    def __init__(self, base_url: str, failure_threshold: int, reset_timeout: float, timeout: tuple):
+        self.base_url = base_url
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.state = self.STATE_CLOSED
+        self.stats = Counter()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != self.STATE_CLOSED
+
+    def check(self):
+        """Raise CircuitOpenError if the circuit is open"""
+        if self.is_open:
+            with self._lock:
+                self.stats['short-circuited'] += 1
+            raise CircuitOpenError(f'{self.base_url} is failing, not sending requests to it for now')
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Check the circuit and record the outcome of the block, for requests not sent by HTTP sessions of http, eg. logging in"""
+        self.check()
+        try:
+            yield
+        except requests.exceptions.RequestException:
+            self.record(success=False)
+            raise
+        self.record(success=True)
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self._failures = 0
+                return
+            self._failures += 1
+            self.stats['failures'] += 1
+            if self.state != self.STATE_CLOSED or self._failures < self.failure_threshold:
+                return
+            self.state = self.STATE_OPEN
+            self._opened_at = time.time()
+            self.stats['opened'] += 1
+        logger.warning('Opened the circuit of %s after %s failures', self.base_url, self.failure_threshold)
+        threading.Thread(target=self._probe, name=f'releases-circuit-probe-{self.base_url}', daemon=True).start()
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'open_for': round(time.time() - self._opened_at, 1) if self.is_open else 0,
+                **self.stats,
+            }
+
+    def _probe(self):
+        """Send a request to the host, not through any throttle or circuit, every ``reset_timeout`` seconds until it answers"""
+        with requests.Session() as session:
+            while True:
+                time.sleep(self.reset_timeout)
+                with self._lock:
+                    self.state = self.STATE_HALF_OPEN
+                try:
+                    is_healthy = session.head(self.base_url, timeout=self.timeout, allow_redirects=False).status_code < 500
+                except requests.exceptions.RequestException:
+                    is_healthy = False
+                with self._lock:
+                    self.stats['probes'] += 1
+                    if is_healthy:
+                        self.state = self.STATE_CLOSED
+                        self._failures = 0
+                        break
+                    self.state = self.STATE_OPEN
+        logger.info('Closed the circuit of %s', self.base_url)
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(base_url: str) -> CircuitBreaker:
+    """Return the circuit breaker of the host of ``scheme://host[:port]``"""
+    with _circuit_breakers_lock:
+        if base_url not in _circuit_breakers:
+            _circuit_breakers[base_url] = CircuitBreaker(
+                base_url=base_url,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURES,
+                reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+                timeout=get_timeout(),
+            )
+        return _circuit_breakers[base_url]
+
+
+def get_base_url(url: str) -> str:
+    url_parts = urllib.parse.urlsplit(url)
+    return f'{url_parts.scheme}://{url_parts.netloc}'
+
+
+def is_degraded(url: Optional[str]) -> bool:
+    """Tell whether the circuit of the host of the URL is open"""
+    if not url:
+        return False
+    base_url = get_base_url(url)
+    with _circuit_breakers_lock:
+        circuit_breaker = _circuit_breakers.get(base_url)
+    return circuit_breaker is not None and circuit_breaker.is_open
+
+
+def get_timeout() -> tuple:
+    """Return the connect and read timeouts of requests to GitLab, Jira and Rocket.Chat"""
+    return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+
+def get_circuit_breaker_stats() -> Dict[str, Dict[str, object]]:
+    with _circuit_breakers_lock:
+        circuit_breakers = list(_circuit_breakers.values())
+    return {circuit_breaker.base_url: circuit_breaker.get_stats() for circuit_breaker in circuit_breakers}
@@ -0,0 +1,86 @@
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from django.conf import settings
+
+from .domain.commits import Commit
+from .domain.projects import Project
+from .executor import (
+    Task,
+    TaskBatch,
+    get_executor,
+)
+
+
+if TYPE_CHECKING:
+    from .gitlab import GitlabEngine
+
+
+class CommitGraph:
+
+    """Commits of a project reachable from a set of refs but not from a common ancestor of them all.
+
+    The graph is read with a single range per ref, each starting at the previous ref, and then answers a range between any
+    two of the refs in memory, as the commits of ``target..source`` are the ancestors of ``source`` that are not ancestors of ``target``.
+    """
+
+    def __init__(self, commits: Dict[str, Commit]):
+        self.commits = commits
+        self._positions = {commit_id: position for position, commit_id in enumerate(commits)}
+        self._ancestors = {}
+
+    @classmethod
+    def build(cls, engine: 'GitlabEngine', project: Project, shas: List[str], batch: Optional[TaskBatch] = None) -> 'CommitGraph':
+        shas = list(dict.fromkeys(shas))
+        batch = batch or get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        common_ancestor = cls.get_common_ancestor(engine, project, shas, batch)
+        # what is missing in the graph are ancestors of the previous ref or of the common ancestor
+        ranges = list(zip(shas, [common_ancestor] + shas[:-1]))
+        commits = {}
+        for commit_log in engine.get_commit_logs(project, ranges, batch):
+            for commit in commit_log:
+                commits.setdefault(commit.id, commit)
+        return cls(commits)
+
+    @staticmethod
+    def get_common_ancestor(engine: 'GitlabEngine', project: Project, shas: List[str], batch: TaskBatch) -> str:
+        """Return a common ancestor of all the commits, merging bases of pairs of them round by round
+
+        GitLab answers more than two refs like ``git merge-base A B C``, with the base of ``A`` and a merge of the others, which may
+        not be an ancestor of them all and would leave commits of some ranges out of the graph.
+        """
+        while len(shas) > 1:
+            tasks = [
+                batch.submit(engine.get_merge_base, project, shas[index:index + 2]) if index + 1 < len(shas) else Task.from_result(shas[index])
+                for index in range(0, len(shas), 2)
+            ]
+            shas = [task.result() for task in tasks]
+        return shas[0]
+
+    def get_commit_log(self, source_sha: str, target_sha: str) -> List[Commit]:
+        """Return commits of ``source_sha`` missing in ``target_sha``, the oldest first
+
+        The commits keep the order they were first read in, which is the order the engine lists ranges in. Ranges are read parents
+        first, so that order never puts a commit before its parents.
+        """
+        commit_ids = self.get_ancestors(source_sha) - self.get_ancestors(target_sha)
+        return [self.commits[commit_id] for commit_id in sorted(commit_ids, key=self._positions.__getitem__)]
+
+    def get_ancestors(self, sha: str) -> Set[str]:
+        """Return ids of the commit and its ancestors, as far as they are in the graph"""
+        if sha not in self._ancestors:
+            ancestors = set()
+            commit_ids = [sha]
+            while commit_ids:
+                commit_id = commit_ids.pop()
+                if commit_id in ancestors or commit_id not in self.commits:
+                    continue
+                ancestors.add(commit_id)
+                commit_ids.extend(self.commits[commit_id].parent_ids)
+            self._ancestors[sha] = ancestors
+        return self._ancestors[sha]
@@ -4,6 +4,12 @@ from .commits import Commit
 
 
 class BranchDifference:
+
+    __slots__ = ('commit_log', 'has_diff')
+
     def __init__(self, commit_log: List[Commit], has_diff: bool):
         self.commit_log = commit_log
         self.has_diff = has_diff
+
+    def __reduce__(self):
+        return self.__class__, (self.commit_log, self.has_diff)
@@ -8,7 +8,13 @@ from releases.domain.jira import JiraIssue
 
 
 class Change:
+
+    __slots__ = ('commit', 'jira_issue', 'warning_labels')
+
     def __init__(self, commit: Commit, jira_issue: Optional[JiraIssue], warning_labels: List[str]):
         self.commit = commit
         self.jira_issue = jira_issue
         self.warning_labels = warning_labels
+
+    def __reduce__(self):
+        return self.__class__, (self.commit, self.jira_issue, self.warning_labels)
@@ -2,19 +2,43 @@ import re
 from datetime import datetime
 from typing import (
     Optional,
-    Set,
+    Sequence,
+    Union,
 )
 
+import dateutil.parser
+
+from django.utils.dateparse import parse_datetime
+
+
+JIRA_REFERENCE_PATTERN = re.compile(r'\[(\w+-\d+)\]')
+
+_UNSET = object()
+
 
 class Commit:
-    def __init__(self, id: str, message: str, created_at: datetime, parent_ids: Set[str]):
+
+    __slots__ = ('id', 'message', '_created_at', 'parent_ids', '_jira_reference')
+
+    def __init__(self, id: str, message: str, created_at: Union[datetime, str], parent_ids: Sequence[str]):
         self.id = id
         self.message = message
-        self.created_at = created_at
-        self.parent_ids = parent_ids
+        self._created_at = created_at  # an ISO 8601 string is parsed when needed
+        self.parent_ids = tuple(parent_ids)
+        self._jira_reference = _UNSET
+
+    def __reduce__(self):
+        return self.__class__, (self.id, self.message, self._created_at, self.parent_ids)
+
+    @property
+    def created_at(self) -> datetime:
+        if isinstance(self._created_at, str):
+            self._created_at = parse_datetime(self._created_at) or dateutil.parser.parse(self._created_at)
+        return self._created_at
 
     @property
     def jira_reference(self) -> Optional[str]:
-        match = re.match('\[(\w+-\d+)\]', self.message)
-        if match:
-            return match.groups()[0]
+        if self._jira_reference is _UNSET:
+            match = JIRA_REFERENCE_PATTERN.match(self.message)
+            self._jira_reference = match.group(1) if match else None
+        return self._jira_reference
@@ -2,7 +2,13 @@ from typing import List
 
 
 class JiraIssue:
+
+    __slots__ = ('key', 'summary', 'labels')
+
     def __init__(self, key: str, summary: str, labels: List[str]):
         self.key = key
         self.summary = summary
         self.labels = labels
+
+    def __reduce__(self):
+        return self.__class__, (self.key, self.summary, self.labels)
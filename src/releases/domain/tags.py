@@ -9,12 +9,18 @@ from typing import Optional
 
 @total_ordering
 class Tag:
+
+    __slots__ = ('major', 'minor', 'patch', 'fix')
+
     def __init__(self, major: int, minor: int, patch: int, fix: Optional[int] = None):
         self.major = major
         self.minor = minor
         self.patch = patch
         self.fix = fix
 
+    def __reduce__(self):
+        return self.__class__, (self.major, self.minor, self.patch, self.fix)
+
     def __str__(self) -> str:
         tag = f'v{self.major}.{self.minor}.{self.patch}'
         if self.fix is not None:
@@ -0,0 +1,211 @@
+import atexit
+import functools
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from django.conf import settings
+
+from .throttling import (
+    get_priority,
+    prioritized,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+
+    """A unit of work run either by a pool worker or by the first thread that waits for its result.
+
+    Letting the waiting thread run a task that has not been picked up yet makes nested submission safe: a pool worker waiting for
+    a task it submitted never blocks on a queue that only busy workers could drain. The task runs with the priority of requests of
+    the thread that submitted it, see throttling.
+    """
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        self.future = Future()
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._priority = get_priority()
+        self._claimed = False
+        self._claim_lock = threading.Lock()
+
+    @classmethod
+    def from_result(cls, result: Any) -> 'Task':
+        task = cls(lambda: result, (), {})
+        task.run()
+        return task
+
+    def run(self):
+        with self._claim_lock:
+            if self._claimed:
+                return
+            self._claimed = True
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            with prioritized(self._priority):
+                result = self._fn(*self._args, **self._kwargs)
+        except BaseException as e:  # pylint: disable=broad-except
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+        finally:
+            self._fn = self._args = self._kwargs = None
+
+    def cancel(self) -> bool:
+        with self._claim_lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+        return self.future.cancel()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        if timeout is None:
+            self.run()
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def add_done_callback(self, fn: Callable[['Task'], None]):
+        self.future.add_done_callback(lambda future: fn(self))
+
+
+class TaskBatch:
+
+    """Tasks of a single request, of which at most ``max_pending`` are queued in the shared pool at a time.
+
+    The rest wait in the batch backlog until a slot is released or until somebody asks for their result.
+    """
+
+    def __init__(self, executor: 'BoundedExecutor', max_pending: int):
+        self._executor = executor
+        self._max_pending = max(1, max_pending)
+        self._pending = 0
+        self._backlog = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Task:
+        task = Task(fn, args, kwargs)
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._backlog.append(task)
+                return task
+            self._pending += 1
+        self._schedule(task)
+        return task
+
+    def _schedule(self, task: Task):
+        task.add_done_callback(self._release)
+        self._executor.enqueue(task)
+
+    def _release(self, task: Task):
+        with self._lock:
+            while self._backlog:
+                next_task = self._backlog.popleft()
+                if not next_task.done():
+                    break
+            else:
+                self._pending -= 1
+                return
+        self._schedule(next_task)
+
+
+class BoundedExecutor:
+
+    """A process-wide thread pool with a fixed upper bound of worker threads, started lazily."""
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'releases-executor'):
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._queue = queue.Queue()
+        self._threads = []
+        self._idle_semaphore = threading.Semaphore(0)
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Task:
+        task = Task(fn, args, kwargs)
+        self.enqueue(task)
+        return task
+
+    def batch(self, max_pending: int) -> TaskBatch:
+        return TaskBatch(self, max_pending)
+
+    def enqueue(self, task: Task):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot schedule new tasks after the executor has been shut down.')
+            self._queue.put(task)
+            if not self._idle_semaphore.acquire(timeout=0) and len(self._threads) < self._max_workers:
+                thread = threading.Thread(name=f'{self._thread_name_prefix}-{len(self._threads)}', target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            while True:
+                try:
+                    task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                task.cancel()
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            task.run()
+            self._idle_semaphore.release()
+
+
+_executor: Optional[BoundedExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> BoundedExecutor:
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedExecutor(max_workers=settings.EXECUTOR_MAX_WORKERS)
+                register_shutdown(functools.partial(_executor.shutdown, wait=False))
+    return _executor
+
+
+def register_shutdown(callback: Callable[[], None]):
+    """Call back when the process exits, including uWSGI workers recycled after max-requests"""
+    atexit.register(callback)
+    try:
+        import uwsgi
+    except ImportError:
+        return
+    # uWSGI recycles workers (max-requests) by calling its own atexit hook, which is a single callable
+    previous_hook = getattr(uwsgi, 'atexit', None)
+
+    def uwsgi_atexit():
+        callback()
+        if previous_hook:
+            previous_hook()
+
+    uwsgi.atexit = uwsgi_atexit
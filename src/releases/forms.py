@@ -1,8 +1,36 @@
+from typing import List
+
 from django import forms
+from django.conf import settings
 
+from releases.domain.projects import Project
 from releases.versioning import VersioningScheme
 
 
+class ProjectForm(forms.Form):
+    project_gitlab_id = forms.CharField(widget=forms.HiddenInput())
+
+
+class ProjectFilterForm(forms.Form):
+    projects = forms.MultipleChoiceField(required=False, widget=forms.CheckboxSelectMultiple)
+    tag_group = forms.ChoiceField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['projects'].choices = [(p.gitlab_id, p.name) for p in settings.PROJECTS]
+        self.fields['tag_group'].choices = [('', 'Any tag group')] + [
+            (tag_group, tag_group) for tag_group in sorted({p.tag_group for p in settings.PROJECTS if p.tag_group})
+        ]
+
+    def get_projects(self) -> List[Project]:
+        gitlab_ids = set(self.cleaned_data['projects'])
+        tag_group = self.cleaned_data['tag_group']
+        return [
+            p for p in settings.PROJECTS
+            if (not gitlab_ids or p.gitlab_id in gitlab_ids) and (not tag_group or p.tag_group == tag_group)
+        ]
+
+
 class MergeRequestForm(forms.Form):
     project_gitlab_id = forms.CharField()
     source_branch = forms.CharField()
@@ -33,3 +61,4 @@ class TagForm(forms.Form):
 
 class PostDeploymentHookForm(forms.Form):
     project_gitlab_id = forms.CharField()
+    tag = forms.CharField(required=False)
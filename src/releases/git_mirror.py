@@ -0,0 +1,156 @@
+import base64
+import fcntl
+import os
+import subprocess
+import threading
+import time
+import urllib.parse
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from django.conf import settings
+
+
+class GitMirrorError(Exception):
+    pass
+
+
+class GitMirror:
+
+    """A local bare mirror of branches and tags of a GitLab repository, shared by all application processes.
+
+    The mirror is fetched incrementally, at most every ``fetch_interval`` seconds unless expired, with a file lock making sure only one
+    thread or process fetches at a time.
+    """
+
+    GIT_TIMEOUT = 600
+    FETCH_STAMP_NAME = 'release-manager-fetched'
+
+    def __init__(self, path: str, url: str, fetch_interval: int, private_token: Optional[str] = None):
+        self.path = path
+        self.url = url
+        self.fetch_interval = fetch_interval
+        self.private_token = private_token
+        self._stamp_path = os.path.join(path, self.FETCH_STAMP_NAME)
+        self._lock_path = f'{path}.lock'
+
+    def get_tag_names(self) -> List[str]:
+        self.update()
+        return self.git('for-each-ref', '--format=%(refname:strip=2)', 'refs/tags').splitlines()
+
+    def get_sha(self, ref: str) -> str:
+        if ref.startswith('-'):
+            raise GitMirrorError(f'Invalid ref {ref}')
+        self.update()
+        return self.git('rev-parse', '--verify', f'{ref}^{{commit}}').strip()
+
+    def get_commit_log(self, source_sha: str, target_sha: str) -> List[Tuple[str, List[str], str, str]]:
+        """Return ids, parent ids, ISO commit dates and titles of commits of ``source_sha`` missing in ``target_sha``, the oldest first"""
+        self.ensure_commits(source_sha, target_sha)
+        output = self.git('log', '-z', '--reverse', '--format=%H%x1f%P%x1f%cI%x1f%B', f'{target_sha}..{source_sha}')
+        commit_log = []
+        for entry in filter(None, output.split('\0')):
+            sha, parent_ids, committed_at, message = entry.split('\x1f', 3)
+            commit_log.append((sha, parent_ids.split(), committed_at, message.strip().split('\n', 1)[0]))
+        return commit_log
+
+    def get_merge_base(self, shas: List[str]) -> str:
+        self.ensure_commits(*shas)
+        return self.git('merge-base', '--octopus', *shas).strip()
+
+    def get_tree_sha(self, sha: str) -> str:
+        self.ensure_commits(sha)
+        return self.git('rev-parse', '--verify', f'{sha}^{{tree}}').strip()
+
+    def has_diff(self, source_sha: str, target_sha: str) -> bool:
+        """Tell whether ``source_sha`` changes any file since its merge base with ``target_sha``, like the GitLab compare API"""
+        self.ensure_commits(source_sha, target_sha)
+        process = self.run('diff', '--quiet', f'{target_sha}...{source_sha}')
+        if process.returncode not in (0, 1):
+            raise GitMirrorError(f'Could not compare {target_sha}...{source_sha}: {process.stderr.decode().strip()}')
+        return process.returncode == 1
+
+    def ensure_commits(self, *shas: str):
+        """Fetch the mirror unless it contains all the commits, eg. reported by a webhook a moment ago"""
+        self.update()
+        if any(self.run('cat-file', '-e', f'{sha}^{{commit}}').returncode for sha in shas):
+            self.update(force=True)
+
+    def expire(self):
+        try:
+            os.remove(self._stamp_path)
+        except FileNotFoundError:
+            pass
+
+    def update(self, force: bool = False):
+        requested_at = time.time()
+        if not force and requested_at - self._get_fetched_at() < self.fetch_interval:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self._lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self._get_fetched_at() >= requested_at - (0 if force else self.fetch_interval):
+                    return  # fetched by another thread or process in the meantime
+                if not os.path.exists(os.path.join(self.path, 'HEAD')):
+                    self._init()
+                self.git(*self._get_auth_options(), 'fetch', '--prune', '--quiet', 'origin')
+                with open(self._stamp_path, 'w'):
+                    pass
+                os.utime(self._stamp_path, (requested_at, requested_at))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def git(self, *args: str) -> str:
+        process = self.run(*args)
+        if process.returncode:
+            raise GitMirrorError(f'git {args[0]} in {self.path} failed: {process.stderr.decode().strip()}')
+        return process.stdout.decode()
+
+    def run(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ['git', f'--git-dir={self.path}', *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={**os.environ, 'GIT_TERMINAL_PROMPT': '0'},
+            timeout=self.GIT_TIMEOUT,
+        )
+
+    def _init(self):
+        self.git('init', '--bare', '--quiet')
+        # the credentials are never stored in the repository configuration, see _get_auth_options
+        self.git('config', 'remote.origin.url', self.url)
+        self.git('config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*')
+        self.git('config', '--add', 'remote.origin.fetch', '+refs/tags/*:refs/tags/*')
+
+    def _get_auth_options(self) -> List[str]:
+        if not self.private_token:
+            return []
+        credentials = base64.b64encode(f'oauth2:{self.private_token}'.encode()).decode()
+        return ['-c', f'http.extraHeader=Authorization: Basic {credentials}']
+
+    def _get_fetched_at(self) -> float:
+        try:
+            return os.path.getmtime(self._stamp_path)
+        except FileNotFoundError:
+            return float('-inf')
+
+
+_mirrors: Dict[str, GitMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_git_mirror(gitlab_id: str) -> GitMirror:
+    with _mirrors_lock:
+        if gitlab_id not in _mirrors:
+            _mirrors[gitlab_id] = GitMirror(
+                path=os.path.join(settings.STORAGE_DIR, 'mirrors', f"{urllib.parse.quote(gitlab_id, safe='')}.git"),
+                url=settings.GITLAB_MIRROR_URL.format(host=settings.GITLAB_HOST.rstrip('/'), gitlab_id=gitlab_id),
+                fetch_interval=settings.GITLAB_MIRROR_FETCH_INTERVAL,
+                private_token=settings.GITLAB_PRIVATE_TOKEN,
+            )
+        return _mirrors[gitlab_id]
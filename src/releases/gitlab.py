@@ -1,31 +1,363 @@
+import asyncio
+import hashlib
+import json
+import logging
 import re
+import threading
 import time
+import urllib.parse
+from abc import (
+    ABC,
+    abstractmethod,
+)
 from typing import (
-    Generator,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
     Optional,
+    Tuple,
+    Union,
 )
 
-import dateutil.parser
+import aiohttp
 import gitlab
+import gitlab.v4.objects
+import requests
 from cached_property import cached_property
-from unstdlib import listify
 
 from django.conf import settings
 
+from .aio import (
+    run_coroutine,
+    run_coroutines,
+    send_request,
+)
+from .cache import NamespacedCache
+from .circuit_breaker import is_degraded
+from .commit_graph import CommitGraph
 from .domain.branch_difference import BranchDifference
 from .domain.commits import Commit
 from .domain.merge_requests import MergeRequest
 from .domain.projects import Project
 from .domain.tags import Tag
+from .executor import (
+    TaskBatch,
+    get_executor,
+)
+from .git_mirror import (
+    GitMirrorError,
+    get_git_mirror,
+)
+from .http import mount_connection_pool
+from .single_flight import SingleFlight
+from .throttling import (
+    Priority,
+    get_priority,
+)
 from .versioning import get_versioning_scheme
 
 
+logger = logging.getLogger(__name__)
+
+TAG_NAME_PATTERN = re.compile(r'^v(\d+)\.(\d+)\.(\d+)(?:\.(\d+))?$')
+
+
+class GitlabEngine(ABC):
+
+    """The way branch heads, tags and commit ranges of repositories are read, selected with GITLAB_ENGINE"""
+
+    @property
+    @abstractmethod
+    def ID(self) -> str:
+        pass
+
+    # errors of reading the repository, after which has_diff tells changes by commits instead of comparing trees
+    ERRORS: Tuple[type, ...] = ()
+
+    def __init__(self, gitlab_client: 'GitlabClient'):
+        self.gitlab_client = gitlab_client
+
+    @abstractmethod
+    def get_tag_names(self, project: Project) -> Iterable[str]:
+        pass
+
+    @abstractmethod
+    def get_sha(self, project: Project, ref: str) -> str:
+        pass
+
+    def get_shas(self, project: Project, refs: Iterable[str]) -> Dict[str, str]:
+        return {ref: self.get_sha(project, ref) for ref in refs}
+
+    @abstractmethod
+    def get_merge_base(self, project: Project, shas: List[str]) -> str:
+        """Return the best common ancestor of two commits, see CommitGraph for more of them"""
+
+    @abstractmethod
+    def get_commit_log(self, project: Project, source_sha: str, target_sha: str) -> List[Commit]:
+        """Return commits of ``source_sha`` missing in ``target_sha``, the oldest first"""
+
+    def get_commit_logs(self, project: Project, ranges: List[Tuple[str, str]], batch: Optional[TaskBatch] = None) -> List[List[Commit]]:
+        """Return commit logs of ``(source_sha, target_sha)`` pairs, read concurrently in the batch or in a batch of their own"""
+        batch = batch or get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        tasks = [batch.submit(self.get_commit_log, project, source_sha, target_sha) for source_sha, target_sha in ranges]
+        return [task.result() for task in tasks]
+
+    @abstractmethod
+    def get_tree_sha(self, project: Project, sha: str) -> str:
+        """Return the SHA of the root tree of the commit, the same for commits with the same files"""
+
+    def get_tree_shas(self, project: Project, shas: Iterable[str]) -> List[str]:
+        return [self.get_tree_sha(project, sha) for sha in shas]
+
+    @abstractmethod
+    def has_file_changes(self, project: Project, source_sha: str, target_sha: str) -> bool:
+        """Tell whether ``source_sha`` changes any file since its merge base with ``target_sha``"""
+
+    def expire(self, project: Project):
+        """Make sure the next read sees the current state of the repository"""
+
+    def compare_commits(self, project: Project, source_sha: str, target_sha: str) -> BranchDifference:
+        commit_log = self.get_commit_log(project, source_sha, target_sha)
+        return BranchDifference(
+            commit_log=commit_log,
+            has_diff=self.has_diff(project, commit_log, source_sha, target_sha),
+        )
+
+    def has_diff(self, project: Project, commit_log: List[Commit], source_sha: str, target_sha: str) -> bool:
+        """Tell whether ``source_sha`` changes any file since its merge base with ``target_sha``, like the GitLab compare API"""
+        if not commit_log:
+            return False
+        try:
+            # the same files mean no changes, even if the commits change something and then revert it
+            merge_base = self.get_merge_base(project, [source_sha, target_sha])
+            source_tree_sha, merge_base_tree_sha = self.get_tree_shas(project, [source_sha, merge_base])
+            return source_tree_sha != merge_base_tree_sha
+        except self.ERRORS:
+            logger.warning('Could not compare trees of %s..%s in project %s', target_sha, source_sha, project, exc_info=True)
+        if any(len(commit.parent_ids) == 1 for commit in commit_log):
+            return True
+        # merge commits alone, like after merging a branch back, may bring no changes, so only then the diff has to be checked
+        return self.has_file_changes(project, source_sha, target_sha)
+
+
+class ApiGitlabEngine(GitlabEngine):
+
+    ID = 'api'
+    ERRORS = (gitlab.exceptions.GitlabError, requests.exceptions.RequestException)
+
+    TAGS_PAGE_SIZE = 100
+    COMMITS_PAGE_SIZE = 100
+    TREE_PAGE_SIZE = 100
+
+    def get_tag_names(self, project: Project) -> Iterable[str]:
+        gitlab_project = self.gitlab_client.get_gitlab_project(project)
+        return (tag.name for tag in gitlab_project.tags.list(as_list=False, per_page=self.TAGS_PAGE_SIZE))
+
+    def get_sha(self, project: Project, ref: str) -> str:
+        gitlab_project = self.gitlab_client.get_gitlab_project(project)
+        return gitlab_project.commits.get(ref).id
+
+    def get_merge_base(self, project: Project, shas: List[str]) -> str:
+        return self.gitlab_client.api_client.http_get(
+            f"/projects/{urllib.parse.quote(project.gitlab_id, safe='')}/repository/merge_base",
+            query_data={'refs[]': shas},
+        )['id']
+
+    def get_commit_log(self, project: Project, source_sha: str, target_sha: str) -> List[Commit]:
+        gitlab_project = self.gitlab_client.get_gitlab_project(project)
+        commit_log = []
+        # the same commits as in the compare API, but without downloading the diffs
+        for commit in gitlab_project.commits.list(ref_name=f'{target_sha}..{source_sha}', as_list=False, per_page=self.COMMITS_PAGE_SIZE):
+            commit_log.append(Commit(
+                id=commit.id,
+                message=commit.title,
+                created_at=commit.created_at,
+                parent_ids=commit.parent_ids,
+            ))
+        commit_log.reverse()  # the compare API lists the oldest commit first
+        return commit_log
+
+    def get_tree_sha(self, project: Project, sha: str) -> str:
+        gitlab_project = self.gitlab_client.get_gitlab_project(project)
+        return get_tree_sha(gitlab_project.repository_tree(ref=sha, all=True, per_page=self.TREE_PAGE_SIZE))
+
+    def has_file_changes(self, project: Project, source_sha: str, target_sha: str) -> bool:
+        response = self.gitlab_client.api_client.http_get(
+            f"/projects/{urllib.parse.quote(project.gitlab_id, safe='')}/repository/compare",
+            query_data={'from': target_sha, 'to': source_sha},
+            streamed=True,
+            raw=True,
+        )
+        content = bytearray()
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                content += chunk
+                if len(content) > settings.GITLAB_COMPARE_MAX_BYTES:
+                    return True  # only diffs can make the response that big
+        finally:
+            response.close()
+        return bool(json.loads(content.decode())['diffs'])
+
+
+class AsyncApiGitlabEngine(ApiGitlabEngine):
+
+    """Reads repositories through the GitLab API like the api engine, but makes the requests of a batch concurrently in the event loop"""
+
+    ID = 'async'
+    ERRORS = (gitlab.exceptions.GitlabError, requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError)
+
+    def get_tag_names(self, project: Project) -> Iterable[str]:
+        tags = run_coroutine(self.fetch_all_pages(project, 'repository/tags', {}, self.TAGS_PAGE_SIZE, get_priority()))
+        return [tag['name'] for tag in tags]
+
+    def get_sha(self, project: Project, ref: str) -> str:
+        return self.get_shas(project, [ref])[ref]
+
+    def get_shas(self, project: Project, refs: Iterable[str]) -> Dict[str, str]:
+        refs = list(refs)
+        priority = get_priority()
+        commits = run_coroutines(
+            self.fetch(project, f"repository/commits/{urllib.parse.quote(ref, safe='')}", {}, priority) for ref in refs
+        )
+        return {ref: commit['id'] for ref, (commit, _) in zip(refs, commits)}
+
+    def get_merge_base(self, project: Project, shas: List[str]) -> str:
+        commit, _ = run_coroutine(self.fetch(project, 'repository/merge_base', [('refs[]', sha) for sha in shas], get_priority()))
+        return commit['id']
+
+    def get_commit_log(self, project: Project, source_sha: str, target_sha: str) -> List[Commit]:
+        return self.get_commit_logs(project, [(source_sha, target_sha)])[0]
+
+    def get_commit_logs(self, project: Project, ranges: List[Tuple[str, str]], batch: Optional[TaskBatch] = None) -> List[List[Commit]]:
+        priority = get_priority()
+        commit_logs = run_coroutines(
+            self.fetch_all_pages(project, 'repository/commits', {'ref_name': f'{target_sha}..{source_sha}'}, self.COMMITS_PAGE_SIZE, priority)
+            for source_sha, target_sha in ranges
+        )
+        return [[
+            Commit(id=commit['id'], message=commit['title'], created_at=commit['created_at'], parent_ids=commit['parent_ids'])
+            for commit in reversed(commit_log)  # the compare API lists the oldest commit first
+        ] for commit_log in commit_logs]
+
+    def get_tree_sha(self, project: Project, sha: str) -> str:
+        return self.get_tree_shas(project, [sha])[0]
+
+    def get_tree_shas(self, project: Project, shas: Iterable[str]) -> List[str]:
+        priority = get_priority()
+        trees = run_coroutines(self.fetch_all_pages(project, 'repository/tree', {'ref': sha}, self.TREE_PAGE_SIZE, priority) for sha in shas)
+        return [get_tree_sha(tree) for tree in trees]
+
+    async def fetch_all_pages(self, project: Project, path: str, params: dict, page_size: int, priority: Priority) -> List[dict]:
+        """Fetch the first page and then all the others at once"""
+        params = {**params, 'per_page': page_size}
+        items, headers = await self.fetch(project, path, {**params, 'page': 1}, priority)
+        if headers.get('X-Total-Pages'):
+            pages = await asyncio.gather(*(
+                self.fetch(project, path, {**params, 'page': page}, priority) for page in range(2, int(headers['X-Total-Pages']) + 1)
+            ))
+            for page_items, _ in pages:
+                items.extend(page_items)
+        else:
+            # GitLab does not count very long lists
+            while headers.get('X-Next-Page'):
+                page_items, headers = await self.fetch(project, path, {**params, 'page': headers['X-Next-Page']}, priority)
+                items.extend(page_items)
+        return items
+
+    @staticmethod
+    async def fetch(
+        project: Project,
+        path: str,
+        params: Union[dict, List[Tuple[str, str]]],
+        priority: Priority,
+    ) -> Tuple[Any, Mapping[str, str]]:
+        """Fetch a resource of the project, the priority being that of the thread the batch came from, as coroutines run in the event loop"""
+        response = await send_request(
+            'GET',
+            f"{settings.GITLAB_HOST.rstrip('/')}/api/v4/projects/{urllib.parse.quote(project.gitlab_id, safe='')}/{path}",
+            priority,
+            params=params,
+            headers={'PRIVATE-TOKEN': settings.GITLAB_PRIVATE_TOKEN},
+        )
+        if response.status >= 400:
+            raise gitlab.exceptions.GitlabGetError(await response.text(), response_code=response.status)
+        return await response.json(), response.headers
+
+
+class MirrorGitlabEngine(GitlabEngine):
+
+    """Reads repositories from local bare mirrors, see git_mirror"""
+
+    ID = 'mirror'
+    ERRORS = (GitMirrorError,)
+
+    def get_tag_names(self, project: Project) -> Iterable[str]:
+        return get_git_mirror(project.gitlab_id).get_tag_names()
+
+    def get_sha(self, project: Project, ref: str) -> str:
+        return get_git_mirror(project.gitlab_id).get_sha(ref)
+
+    def get_merge_base(self, project: Project, shas: List[str]) -> str:
+        return get_git_mirror(project.gitlab_id).get_merge_base(shas)
+
+    def get_commit_log(self, project: Project, source_sha: str, target_sha: str) -> List[Commit]:
+        return [
+            Commit(id=sha, message=title, created_at=committed_at, parent_ids=parent_ids)
+            for sha, parent_ids, committed_at, title in get_git_mirror(project.gitlab_id).get_commit_log(source_sha, target_sha)
+        ]
+
+    def get_tree_sha(self, project: Project, sha: str) -> str:
+        return get_git_mirror(project.gitlab_id).get_tree_sha(sha)
+
+    def has_file_changes(self, project: Project, source_sha: str, target_sha: str) -> bool:
+        return get_git_mirror(project.gitlab_id).has_diff(source_sha, target_sha)
+
+    def expire(self, project: Project):
+        get_git_mirror(project.gitlab_id).expire()
+
+
+def get_tree_sha(tree: Iterable[Mapping[str, str]]) -> str:
+    """Return the Git SHA of a tree listed by the GitLab repository tree API, which does not tell it itself"""
+    # Git sorts subtrees as if their names ended with a slash, and writes modes without leading zeros, eg. 40000 for subtrees
+    entries = sorted(tree, key=lambda entry: entry['name'].encode() + (b'/' if entry['type'] == 'tree' else b''))
+    content = b''.join(
+        f"{entry['mode'].lstrip('0')} {entry['name']}".encode() + b'\0' + bytes.fromhex(entry['id']) for entry in entries
+    )
+    return hashlib.sha1(b'tree %d\0' % len(content) + content).hexdigest()
+
+
+def get_engine_classes(base_class: type = GitlabEngine) -> Iterator[type]:
+    for engine_class in base_class.__subclasses__():
+        yield engine_class
+        yield from get_engine_classes(engine_class)
+
+
+def get_gitlab_engine(engine_id: str, gitlab_client: 'GitlabClient') -> GitlabEngine:
+    engine_class = next(engine for engine in get_engine_classes() if engine.ID == engine_id)
+    return engine_class(gitlab_client)
+
+
 class GitlabClient:
 
     MERGE_AUTOMATICALLY_MAX_TRIES = 3
 
+    compare_cache = NamespacedCache('compare')
+    ref_cache = NamespacedCache('ref')
+    tag_index_cache = NamespacedCache('tags')
+
+    ref_flight = SingleFlight('ref')
+    tag_index_flight = SingleFlight('tags')
+    compare_flight = SingleFlight('compare')
+
+    @classmethod
+    def is_degraded(cls) -> bool:
+        return is_degraded(settings.GITLAB_HOST)
+
     def create_merge_request(self, project: Project, merge_request: MergeRequest):
-        gitlab_project = self.api_client.projects.get(project.gitlab_id)
+        gitlab_project = self.get_gitlab_project(project)
         return gitlab_project.mergerequests.create({
             'source_branch': merge_request.source_branch,
             'target_branch': merge_request.target_branch,
@@ -34,7 +366,7 @@ class GitlabClient:
         })
 
     def merge_automatically(self, project: Project, merge_request_id: int):
-        gitlab_project = self.api_client.projects.get(project.gitlab_id)
+        gitlab_project = self.get_gitlab_project(project)
         gitlab_merge_request = gitlab_project.mergerequests.get(merge_request_id)
         for try_number in range(1, self.MERGE_AUTOMATICALLY_MAX_TRIES + 1):
             try:
@@ -51,44 +383,147 @@ class GitlabClient:
             gitlab_merge_request.merge()
 
     def create_tag(self, project: Project, tag: Tag):
-        gitlab_project = self.api_client.projects.get(project.gitlab_id)
+        gitlab_project = self.get_gitlab_project(project)
         versioning_scheme = get_versioning_scheme(project.versioning_scheme)
         gitlab_project.tags.create({
             'tag_name': str(tag),
             'ref': project.production_environment_branch,
             'message': versioning_scheme.get_tag_description(tag),
         })
+        self.update_tag_index(project, str(tag))
 
-    @listify
-    def get_last_tags(self, project: Project, tag_count: int) -> Generator[Tag, None, None]:
-        gitlab_project = self.api_client.projects.get(project.gitlab_id)
-        tags = gitlab_project.tags.list(per_page=tag_count, search='v')
-        for tag in tags:
-            match = re.search('^v(\d+)\.(\d+)\.(\d+)(?:\.(\d+))?$', tag.name)
-            if match:
-                segments = tuple(filter(None, match.groups()))
-                if 3 <= len(segments) <= 4:
-                    yield Tag(*map(int, segments))
+    def get_last_tags(self, project: Project, tag_count: int) -> List[Tag]:
+        return self.get_tag_index(project)[:tag_count]
 
     def get_latest_tag(self, project: Project) -> Optional[Tag]:
-        return next(iter(self.get_last_tags(project, tag_count=1)), None)
+        return next(iter(self.get_tag_index(project)), None)
+
+    def get_tag_index(self, project: Project) -> List[Tag]:
+        """Return all version tags of the project, the latest first"""
+        tags = self.tag_index_cache.get(project.gitlab_id)
+        if tags is None:
+            tags = self.tag_index_flight.do(project.gitlab_id, self.build_tag_index, project)
+        return tags
+
+    def build_tag_index(self, project: Project) -> List[Tag]:
+        tags = self.parse_tags(self.engine.get_tag_names(project))
+        self.tag_index_cache.set(project.gitlab_id, tags, timeout=settings.GITLAB_TAG_INDEX_TTL)
+        return tags
+
+    def update_tag_index(self, project: Project, tag_name: str, deleted: bool = False):
+        self.engine.expire(project)
+        tags = self.tag_index_cache.get(project.gitlab_id)
+        if tags is None:
+            return  # built from scratch when needed
+        changed_tags = self.parse_tags([tag_name])
+        if deleted:
+            tags = [tag for tag in tags if tag not in changed_tags]
+        else:
+            tags = sorted(tags + [tag for tag in changed_tags if tag not in tags], reverse=True)
+        self.tag_index_cache.set(project.gitlab_id, tags, timeout=settings.GITLAB_TAG_INDEX_TTL)
+
+    @staticmethod
+    def parse_tags(tag_names: Iterable[str]) -> List[Tag]:
+        """Return version tags, the latest first, skipping names that are not versions"""
+        tags = []
+        for match in filter(None, map(TAG_NAME_PATTERN.match, tag_names)):
+            tags.append(Tag(*(int(segment) for segment in match.groups() if segment is not None)))
+        return sorted(tags, reverse=True)
+
+    def resolve_ref(self, project: Project, ref: str) -> str:
+        return self.resolve_refs(project, [ref])[ref]
+
+    def resolve_refs(self, project: Project, refs: Iterable[str]) -> Dict[str, str]:
+        refs_by_cache_key = {f'{project.gitlab_id}:{ref}': ref for ref in sorted(refs)}
+        shas = {refs_by_cache_key[cache_key]: sha for cache_key, sha in self.ref_cache.get_many(refs_by_cache_key).items()}
+        unresolved_refs = [ref for ref in refs_by_cache_key.values() if ref not in shas]
+        if unresolved_refs:
+            resolved_shas = self.ref_flight.do(f"{project.gitlab_id}:{':'.join(unresolved_refs)}", self.engine.get_shas, project, unresolved_refs)
+            if settings.GITLAB_REF_CACHE_TTL:
+                for ref, sha in resolved_shas.items():
+                    self.ref_cache.set(f'{project.gitlab_id}:{ref}', sha, timeout=settings.GITLAB_REF_CACHE_TTL)
+            shas.update(resolved_shas)
+        return shas
+
+    def remember_ref(self, project: Project, ref: str, sha: str):
+        self.engine.expire(project)
+        if settings.GITLAB_REF_CACHE_TTL:
+            self.ref_cache.set(f'{project.gitlab_id}:{ref}', sha, timeout=settings.GITLAB_REF_CACHE_TTL)
+
+    def forget_ref(self, project: Project, ref: str):
+        self.engine.expire(project)
+        self.ref_cache.delete(f'{project.gitlab_id}:{ref}')
 
     def compare_refs(self, project: Project, source: str, target: str) -> BranchDifference:
-        gitlab_project = self.api_client.projects.get(project.gitlab_id)
-        commit_log = []
-        comparation_result = gitlab_project.repository_compare(target, source)
-        for commit in comparation_result['commits']:
-            commit_log.append(Commit(
-                id=commit['id'],
-                message=commit['title'],
-                created_at=dateutil.parser.parse(commit['created_at']),
-                parent_ids=commit['parent_ids']
-            ))
-        return BranchDifference(
-            commit_log=commit_log,
-            has_diff=bool(comparation_result['diffs']),
-        )
+        return self.compare_many_refs(project, [(source, target)])[0]
 
-    @cached_property
+    def compare_many_refs(self, project: Project, ranges: List[Tuple[str, str]], batch: Optional[TaskBatch] = None) -> List[BranchDifference]:
+        """Compare ``(source, target)`` pairs of refs, reading the commits shared by the ranges only once, the ranges concurrently in the batch"""
+        shas = self.resolve_refs(project, {ref for refs in ranges for ref in refs})
+        # a difference between two commits never changes, so it can be cached forever
+        cache_keys = [f'{project.gitlab_id}:{shas[target]}:{shas[source]}' for source, target in ranges]
+        differences = self.compare_cache.get_many(cache_keys)
+        missing_ranges = {
+            cache_key: (shas[source], shas[target]) for (source, target), cache_key in zip(ranges, cache_keys) if cache_key not in differences
+        }
+        if missing_ranges:
+            differences.update(self.compare_flight.do(':'.join(missing_ranges), self.compare_missing_ranges, project, missing_ranges, batch))
+        return [differences[cache_key] for cache_key in cache_keys]
+
+    def compare_missing_ranges(
+        self,
+        project: Project,
+        missing_ranges: Dict[str, Tuple[str, str]],
+        batch: Optional[TaskBatch] = None,
+    ) -> Dict[str, BranchDifference]:
+        """Compare ``(source_sha, target_sha)`` pairs by their compare cache keys and store the differences in the cache"""
+        differences = {}
+        if len(missing_ranges) == 1:
+            cache_key, (source_sha, target_sha) = next(iter(missing_ranges.items()))
+            differences[cache_key] = self.engine.compare_commits(project, source_sha, target_sha)
+        else:
+            batch = batch or get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+            # targets first, so the graph is read range by range, like (tag, master), (master, stage), (stage, develop)
+            commit_graph = CommitGraph.build(
+                self.engine, project, [sha for range_shas in missing_ranges.values() for sha in reversed(range_shas)], batch,
+            )
+            commit_logs = {cache_key: commit_graph.get_commit_log(*range_shas) for cache_key, range_shas in missing_ranges.items()}
+            has_diff_tasks = {
+                cache_key: batch.submit(self.engine.has_diff, project, commit_logs[cache_key], source_sha, target_sha)
+                for cache_key, (source_sha, target_sha) in missing_ranges.items()
+            }
+            for cache_key, has_diff_task in has_diff_tasks.items():
+                differences[cache_key] = BranchDifference(commit_log=commit_logs[cache_key], has_diff=has_diff_task.result())
+        for cache_key, difference in differences.items():
+            self.compare_cache.set(cache_key, difference, timeout=None)
+        return differences
+
+    def get_gitlab_project(self, project: Project) -> gitlab.v4.objects.Project:
+        """Return a handle of the project, which does not fetch the project itself"""
+        return self.api_client.projects.get(project.gitlab_id, lazy=True)
+
+    @property
     def api_client(self) -> gitlab.Gitlab:
-        return gitlab.Gitlab(settings.GITLAB_HOST, private_token=settings.GITLAB_PRIVATE_TOKEN)
+        return get_gitlab_api_client()
+
+    @cached_property
+    def engine(self) -> GitlabEngine:
+        return get_gitlab_engine(settings.GITLAB_ENGINE, self)
+
+
+_api_client: Optional[gitlab.Gitlab] = None
+_api_client_lock = threading.Lock()
+
+
+def get_gitlab_api_client() -> gitlab.Gitlab:
+    """Return the GitLab API client shared by all threads of the process, so that connections are kept alive between calls"""
+    global _api_client  # pylint: disable=global-statement
+    if _api_client is None:
+        with _api_client_lock:
+            if _api_client is None:
+                _api_client = gitlab.Gitlab(
+                    settings.GITLAB_HOST,
+                    private_token=settings.GITLAB_PRIVATE_TOKEN,
+                    session=mount_connection_pool(requests.Session()),
+                )
+    return _api_client
@@ -0,0 +1,57 @@
+import itertools
+import logging
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+from .circuit_breaker import (
+    get_base_url,
+    get_circuit_breaker,
+    get_timeout,
+)
+from .throttling import (
+    get_host_throttle,
+    get_priority,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledHTTPAdapter(HTTPAdapter):
+
+    """Sends requests through the circuit breaker and the throttle of their host, sending again those the host throttled.
+
+    Requests with no timeout of their own get HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT. See circuit_breaker and throttling.
+    """
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        throttle = get_host_throttle(urllib.parse.urlsplit(request.url).netloc)
+        circuit_breaker = get_circuit_breaker(get_base_url(request.url))
+        priority = get_priority()
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = get_timeout()
+        for attempt in itertools.count():
+            circuit_breaker.check()
+            with throttle.slot(priority):
+                try:
+                    response = super().send(request, **kwargs)
+                except requests.exceptions.RequestException:
+                    circuit_breaker.record(success=False)
+                    raise
+            circuit_breaker.record(success=response.status_code < 500 or 'Retry-After' in response.headers)
+            if not throttle.observe(request.method, response.status_code, response.headers, attempt):
+                return response
+            logger.warning('Got %s from %s, sending %s %s again', response.status_code, throttle.host, request.method, request.path_url)
+            response.close()
+
+
+def mount_connection_pool(session: requests.Session) -> requests.Session:
+    """Make the session keep up to HTTP_POOL_SIZE connections per host alive, to be reused by all threads of the process, and throttle its requests"""
+    adapter = ThrottledHTTPAdapter(pool_maxsize=settings.HTTP_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
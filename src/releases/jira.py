@@ -1,11 +1,19 @@
+import asyncio
+import json
 import logging
+import threading
+from collections import defaultdict
 from typing import (
+    Dict,
     Generator,
+    Iterable,
     List,
     Optional,
+    Tuple,
 )
 
-from cached_property import cached_property
+import aiohttp
+import requests
 from jira import (
     JIRA,
     JIRAError,
@@ -14,83 +22,286 @@ from unstdlib import listify
 
 from django.conf import settings
 
+from .aio import (
+    run_coroutines,
+    send_request,
+)
+from .cache import NamespacedCache
+from .circuit_breaker import (
+    CircuitOpenError,
+    get_base_url,
+    get_circuit_breaker,
+    get_timeout,
+    is_degraded,
+)
 from .domain.jira import JiraIssue
+from .executor import (
+    Task,
+    get_executor,
+)
+from .http import mount_connection_pool
+from .jira_store import get_jira_issue_store
+from .single_flight import SingleFlight
+from .throttling import (
+    Priority,
+    get_priority,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# timeouts and an open circuit of a degraded Jira come as errors of requests rather than of the client
+JIRA_ERRORS = (JIRAError, requests.exceptions.RequestException)
+
 
 class JiraClient:
 
+    SEARCH_CHUNK_SIZE = 100
+
+    issue_flight = SingleFlight('jira-issue')
+    search_flight = SingleFlight('jira-search')
+    transition_cache = NamespacedCache('jira-transitions')
+
     @classmethod
     def is_configured_properly(cls) -> bool:
         return (settings.JIRA_HOST and settings.JIRA_USERNAME and settings.JIRA_PASSWORD)
 
+    @classmethod
+    def is_degraded(cls) -> bool:
+        return is_degraded(settings.JIRA_HOST)
+
     def get_issue(self, issue_key: str) -> Optional[JiraIssue]:
+        issue_store = get_jira_issue_store()
+        stored_issues = issue_store.get_many([issue_key], max_age=settings.JIRA_ISSUE_TTL)
+        if issue_key in stored_issues:
+            return stored_issues[issue_key]
+        return self.issue_flight.do(issue_key, self.fetch_issue, issue_key)
+
+    def fetch_issue(self, issue_key: str) -> Optional[JiraIssue]:
+        issue_store = get_jira_issue_store()
         try:
             issue = self.api_client.issue(issue_key, fields=['summary', 'labels'])
-        except JIRAError as e:
-            if e.status_code == 404:
+        except JIRA_ERRORS as e:
+            if isinstance(e, JIRAError) and e.status_code == 404:
+                issue_store.set_many({issue_key: None})
                 return None
             logger.exception('Got an error while retrieving issue %s', issue_key)
-            return None
-        return JiraIssue(
+            return issue_store.get_many([issue_key]).get(issue_key)
+        jira_issue = JiraIssue(
             key=issue.key,
             summary=issue.fields.summary,
             labels=issue.fields.labels,
         )
+        issue_store.set_many({issue_key: jira_issue})
+        return jira_issue
+
+    def get_issues(self, issue_keys: Iterable[str]) -> Dict[str, Optional[JiraIssue]]:
+        issue_keys = set(issue_keys)
+        issue_store = get_jira_issue_store()
+        issues = issue_store.get_many(issue_keys, max_age=settings.JIRA_ISSUE_TTL)
+        outdated_issue_keys = issue_keys - issues.keys()
+        if outdated_issue_keys:
+            searched_issues = self.search_flight.do(','.join(sorted(outdated_issue_keys)), self.fetch_issues, outdated_issue_keys)
+            issues.update(issue_store.get_many(outdated_issue_keys - searched_issues.keys()))  # stale data is better than none
+            issues.update(searched_issues)
+        return {issue_key: issues.get(issue_key) for issue_key in issue_keys}
+
+    def fetch_issues(self, issue_keys: Iterable[str]) -> Dict[str, Optional[JiraIssue]]:
+        searched_issues = self.search_issues(issue_keys)
+        get_jira_issue_store().set_many(searched_issues)
+        return searched_issues
+
+    def search_issues(self, issue_keys: Iterable[str]) -> Dict[str, Optional[JiraIssue]]:
+        """Return issues by their keys, missing keys mapped to None, skipping keys of searches that failed
+
+        A search finds an issue moved to another project by its former key, but returns it under its new key, so when a search returns
+        keys that were not asked for, the keys it did not return are looked up one by one, which tells the former keys apart.
+        """
+        issue_keys = sorted(set(issue_keys))
+        chunks = [issue_keys[chunk_start:chunk_start + self.SEARCH_CHUNK_SIZE] for chunk_start in range(0, len(issue_keys), self.SEARCH_CHUNK_SIZE)]
+        if settings.JIRA_ENGINE == 'async':
+            priority = get_priority()
+            chunks_issues = run_coroutines(self.search_chunk_async(chunk, priority) for chunk in chunks)
+        else:
+            chunks_issues = [self.search_chunk(chunk) for chunk in chunks]
+        issues = {}
+        for chunk, chunk_issues in zip(chunks, chunks_issues):
+            if chunk_issues is None:
+                continue
+            found_issues = {issue.key: issue for issue in chunk_issues}
+            issues.update((issue_key, found_issues.get(issue_key)) for issue_key in chunk)
+            if found_issues.keys() - set(chunk):
+                issues.update((issue_key, self.fetch_issue(issue_key)) for issue_key in chunk if issue_key not in found_issues)
+        return issues
+
+    def search_chunk(self, issue_keys: List[str]) -> Optional[List[JiraIssue]]:
+        """Return found issues, or None if the search failed"""
+        try:
+            found_issues = self.api_client.search_issues(
+                f"key in ({', '.join(issue_keys)})",
+                maxResults=len(issue_keys),
+                validate_query=False,  # unknown keys would make Jira reject the whole query
+                fields=['summary', 'labels'],
+            )
+        except JIRA_ERRORS:
+            logger.exception('Got an error while searching for issues %s', ', '.join(issue_keys))
+            return None
+        return [JiraIssue(key=issue.key, summary=issue.fields.summary, labels=issue.fields.labels) for issue in found_issues]
+
+    async def search_chunk_async(self, issue_keys: List[str], priority: Priority) -> Optional[List[JiraIssue]]:
+        """Return found issues, or None if the search failed, searching in the event loop"""
+        if not self.is_configured_properly():
+            logger.error('Insufficient Jira configuration to search for issues %s', ', '.join(issue_keys))
+            return None
+        try:
+            response = await send_request(
+                'GET',
+                f"{settings.JIRA_HOST.rstrip('/')}/rest/api/2/search",
+                priority,
+                params={
+                    'jql': f"key in ({', '.join(issue_keys)})",
+                    'maxResults': str(len(issue_keys)),
+                    'validateQuery': 'false',
+                    'fields': 'summary,labels',
+                },
+                auth=aiohttp.BasicAuth(settings.JIRA_USERNAME, settings.JIRA_PASSWORD),
+            )
+            response.raise_for_status()
+            found_issues = (await response.json())['issues']
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError):
+            logger.exception('Got an error while searching for issues %s', ', '.join(issue_keys))
+            return None
+        return [JiraIssue(key=issue['key'], summary=issue['fields']['summary'], labels=issue['fields']['labels']) for issue in found_issues]
+
+    def add_fix_versions(self, issue_keys: Iterable[str], fix_version: str) -> Dict[str, bool]:
+        """Add the version to fix versions of the issues, creating it once per Jira project, and tell by keys whether it was added
 
-    def add_fix_version(self, issue_key: str, fix_version: str) -> bool:
+        Issues are grouped by the project they are in now, as an issue moved to another project keeps answering to its former key.
+        """
+        batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        project_key_tasks = {issue_key: batch.submit(self.get_project_key, issue_key) for issue_key in issue_keys}
+        issue_keys_by_project = defaultdict(list)
+        for issue_key, project_key_task in project_key_tasks.items():
+            issue_keys_by_project[project_key_task.result()].append(issue_key)
+        version_id_tasks = {
+            project_key: batch.submit(self.get_or_create_version_id, project_key, fix_version) if project_key else Task.from_result(None)
+            for project_key in issue_keys_by_project
+        }
+        update_tasks = {}
+        for project_key, project_issue_keys in issue_keys_by_project.items():
+            version_id = version_id_tasks[project_key].result()
+            for issue_key in project_issue_keys:
+                update_tasks[issue_key] = batch.submit(self.add_fix_version, issue_key, version_id) if version_id else Task.from_result(False)
+        return {issue_key: update_task.result() for issue_key, update_task in update_tasks.items()}
+
+    def get_project_key(self, issue_key: str) -> Optional[str]:
         try:
-            issue = self.api_client.issue(issue_key, fields=['fixVersions', 'project'])
-        except JIRAError:
+            issue = self.api_client.issue(issue_key, fields=['project'])
+        except JIRA_ERRORS:
             logger.exception('Got an error while finding issue %s', issue_key)
-            return False
-        fix_versions = issue.fields.fixVersions
-        if fix_version not in {v.name for v in fix_versions}:
-            try:
-                version = next((v for v in self.api_client.project_versions(issue.fields.project) if v.name == fix_version), None)
-            except JIRAError:
-                logger.exception('Got an error while retrieving project %s versions', issue.fields.project.key)
-                return False
-            if not version:
-                try:
-                    version = self.api_client.create_version(name=fix_version, project=issue.fields.project.key)
-                except JIRAError:
-                    logger.exception('Got an error while creating %s version in project %s', fix_version, issue.fields.project.key)
-                    return False
-            fix_versions.append(version)
+            return None
+        return issue.fields.project.key
+
+    def get_or_create_version_id(self, project_key: str, name: str) -> Optional[str]:
+        try:
+            version = next((v for v in self.api_client.project_versions(project_key) if v.name == name), None)
+        except JIRA_ERRORS:
+            logger.exception('Got an error while retrieving project %s versions', project_key)
+            return None
+        if not version:
             try:
-                issue.update(fields={'fixVersions': [{'id': fv.id} for fv in fix_versions]}, notify=False)
-            except JIRAError:
-                logger.exception('Got an error while setting fixVersions of issue %s', issue_key)
-                return False
+                version = self.api_client.create_version(name=name, project=project_key)
+            except JIRA_ERRORS:
+                logger.exception('Got an error while creating %s version in project %s', name, project_key)
+                return None
+        return version.id
+
+    def add_fix_version(self, issue_key: str, version_id: str) -> bool:
+        try:
+            update_issue(self.api_client, issue_key, {'fixVersions': [{'add': {'id': version_id}}]}, notify=False)
+        except JIRA_ERRORS:
+            logger.exception('Got an error while setting fixVersions of issue %s', issue_key)
+            return False
         return True
 
     @listify
     def make_transitions(self, issue_key: str, transition_names: List[str]) -> Generator[str, None, None]:
+        try:
+            issue = self.api_client.issue(issue_key, fields=['status', 'issuetype', 'project'])
+        except JIRA_ERRORS:
+            logger.exception('Got an error while finding issue %s', issue_key)
+            return
+        workflow = f'{issue.fields.project.key}:{issue.fields.issuetype.id}'
+        status_id = issue.fields.status.id
         for transition_name in transition_names:
             try:
-                transition_to_apply = self.api_client.find_transitionid_by_name(issue_key, transition_name)
-            except JIRAError:
+                transitions = self.get_transitions(issue_key, workflow, status_id)
+            except JIRA_ERRORS:
                 logger.exception('Got an error while finding transition for issue %s by name: %s', issue_key, transition_name)
+                continue
+            if transition_name not in transitions:
+                continue
+            transition_id, to_status_id = transitions[transition_name]
+            try:
+                self.api_client.transition_issue(issue_key, transition_id)
+            except JIRA_ERRORS:
+                logger.exception('Got an error while making %s transition for issue %s', transition_name, issue_key)
+                self.transition_cache.delete(f'{workflow}:{status_id}')  # the workflow may have changed
             else:
-                if transition_to_apply:
-                    try:
-                        self.api_client.transition_issue(issue_key, transition_to_apply)
-                    except JIRAError:
-                        logger.exception('Got an error while making %s transition for issue %s', transition_name, issue_key)
-                    else:
-                        yield transition_name
-
-    @cached_property
-    def api_client(self):
+                status_id = to_status_id
+                yield transition_name
+
+    def get_transitions(self, issue_key: str, workflow: str, status_id: str) -> Dict[str, Tuple[str, str]]:
+        """Return IDs of transitions and their target statuses by names, as available to all issues of the workflow in the status"""
+        key = f'{workflow}:{status_id}'
+        transitions = self.transition_cache.get(key)
+        if transitions is None:
+            transitions = {t['name']: (t['id'], t['to']['id']) for t in self.api_client.transitions(issue_key)}
+            self.transition_cache.set(key, transitions, timeout=settings.JIRA_TRANSITION_TTL)
+        return transitions
+
+    @property
+    def api_client(self) -> JIRA:
         if not self.is_configured_properly():
             raise JIRAError('Insufficient Jira configuration.')
-        return JIRA(
-            server=settings.JIRA_HOST,
-            auth=(
-                settings.JIRA_USERNAME,
-                settings.JIRA_PASSWORD,
-            ),
-        )
+        return get_jira_api_client()
+
+
+_api_client: Optional[JIRA] = None
+_api_client_lock = threading.Lock()
+
+
+def get_jira_api_client() -> JIRA:
+    """Return the Jira API client shared by all threads of the process, so that connections are kept alive between calls"""
+    global _api_client  # pylint: disable=global-statement
+    if _api_client is None:
+        with _api_client_lock:
+            if _api_client is None:
+                # logging in is sent before the session gets the adapter of mount_connection_pool, and the client would sleep
+                # for up to a minute between retries of failed requests, which the circuit breaker takes care of instead
+                with get_circuit_breaker(get_base_url(settings.JIRA_HOST)).guard():
+                    api_client = JIRA(
+                        server=settings.JIRA_HOST,
+                        auth=(
+                            settings.JIRA_USERNAME,
+                            settings.JIRA_PASSWORD,
+                        ),
+                        max_retries=0,
+                        timeout=get_timeout(),
+                    )
+                mount_connection_pool(api_client._session)  # pylint: disable=protected-access
+                _api_client = api_client
+    return _api_client
+
+
+def update_issue(api_client: JIRA, issue_key: str, update: dict, notify: bool = True):
+    """Apply update operations to fields of the issue, like ``Issue.update`` does
+
+    ``Issue.update`` needs the issue fetched first, then sleeps for 4 seconds and fetches it again, while the operations, eg. adding
+    to a field rather than setting it, need neither. The client has no public method for that, hence its session.
+    """
+    api_client._session.put(  # pylint: disable=protected-access
+        api_client._get_url(f'issue/{issue_key}'),  # pylint: disable=protected-access
+        params={'notifyUsers': str(notify).lower()},
+        data=json.dumps({'update': update}),
+    )
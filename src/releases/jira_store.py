@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+import time
+from typing import (
+    Dict,
+    Iterable,
+    Optional,
+)
+
+from django.conf import settings
+
+from .domain.jira import JiraIssue
+from .sqlite_store import SQLiteStore
+
+
+class JiraIssueStore(SQLiteStore):
+
+    """Persistent store of Jira issue metadata shared by all application processes through a single SQLite file.
+
+    Issues that do not exist are stored as well, so they are not looked up again before their entry expires.
+    """
+
+    SQLITE_MAX_VARIABLES = 500
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS jira_issues ('
+        'key TEXT PRIMARY KEY, summary TEXT, labels TEXT, found INTEGER NOT NULL, fetched_at REAL NOT NULL'
+        ')'
+    )
+
+    def get_many(self, issue_keys: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Optional[JiraIssue]]:
+        """Return stored issues by their keys, skipping unknown keys and entries older than ``max_age`` seconds"""
+        issue_keys = list(issue_keys)
+        min_fetched_at = time.time() - max_age if max_age is not None else float('-inf')
+        issues = {}
+        for chunk_start in range(0, len(issue_keys), self.SQLITE_MAX_VARIABLES):
+            chunk = issue_keys[chunk_start:chunk_start + self.SQLITE_MAX_VARIABLES]
+            rows = self.connection.execute(
+                f"SELECT key, summary, labels, found FROM jira_issues WHERE fetched_at >= ? AND key IN ({', '.join('?' * len(chunk))})",
+                [min_fetched_at, *chunk],
+            )
+            for key, summary, labels, found in rows:
+                issues[key] = JiraIssue(key=key, summary=summary, labels=json.loads(labels)) if found else None
+        return issues
+
+    def set_many(self, issues: Dict[str, Optional[JiraIssue]]):
+        fetched_at = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO jira_issues (key, summary, labels, found, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (key, issue.summary, json.dumps(issue.labels), True, fetched_at) if issue else (key, None, None, False, fetched_at)
+                    for key, issue in issues.items()
+                ],
+            )
+
+
+_store: Optional[JiraIssueStore] = None
+_store_lock = threading.Lock()
+
+
+def get_jira_issue_store() -> JiraIssueStore:
+    global _store  # pylint: disable=global-statement
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JiraIssueStore(path=os.path.join(settings.STORAGE_DIR, 'jira-issues.sqlite3'))
+    return _store
@@ -0,0 +1,128 @@
+import pickle
+import random
+import re
+import time
+import tracemalloc
+from typing import (
+    Callable,
+    List,
+)
+
+import dateutil.parser
+
+from django.core.management.base import BaseCommand
+
+from releases.domain.changes import Change
+from releases.domain.commits import Commit
+from releases.domain.jira import JiraIssue
+
+
+class LegacyCommit:
+
+    """Commit as it used to be, for comparison"""
+
+    def __init__(self, id, message, created_at, parent_ids):
+        self.id = id
+        self.message = message
+        self.created_at = created_at
+        self.parent_ids = parent_ids
+
+    @property
+    def jira_reference(self):
+        match = re.match(r'\[(\w+-\d+)\]', self.message)
+        if match:
+            return match.groups()[0]
+
+
+class LegacyJiraIssue:
+
+    def __init__(self, key, summary, labels):
+        self.key = key
+        self.summary = summary
+        self.labels = labels
+
+
+class LegacyChange:
+
+    def __init__(self, commit, jira_issue, warning_labels):
+        self.commit = commit
+        self.jira_issue = jira_issue
+        self.warning_labels = warning_labels
+
+
+class Command(BaseCommand):
+
+    help = 'Measures memory and CPU spent on commits and changes of snapshots, compared with the former dict-backed objects.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--commits', type=int, default=10000, help='Number of commits in the snapshot')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs to take the best time of')
+
+    def handle(self, *args, **options):
+        commits_data = self.make_commits_data(options['commits'])
+        for name, build in [
+            ('legacy', lambda: self.build_legacy_changes(commits_data)),
+            ('compact', lambda: self.build_changes(commits_data)),
+        ]:
+            build_time = self.measure_time(build, options['repeat'])
+            changes = build()
+            render_time = self.measure_time(lambda: self.render(changes), options['repeat'])
+            tracemalloc.start()
+            changes = build()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            pickled = pickle.dumps(changes, pickle.HIGHEST_PROTOCOL)
+            unpickle_time = self.measure_time(lambda: pickle.loads(pickled), options['repeat'])
+            self.stdout.write(
+                f'{name:8} build {build_time * 1000:8.1f} ms   render {render_time * 1000:8.1f} ms   '
+                f'memory {memory / 1024:8.0f} KiB   pickled {len(pickled) / 1024:8.0f} KiB   unpickle {unpickle_time * 1000:8.1f} ms'
+            )
+
+    @staticmethod
+    def make_commits_data(count: int) -> List[dict]:
+        random.seed(0)
+        commits_data = []
+        for index in range(count):
+            commits_data.append({
+                'id': f'{random.getrandbits(160):040x}',
+                'title': f'[ABC-{index % 500}] Change number {index}' if index % 4 else f'Merge branch feature-{index} into develop',
+                'created_at': f'2020-01-{index % 28 + 1:02}T12:{index % 60:02}:00.000+01:00',
+                'parent_ids': [f'{random.getrandbits(160):040x}' for _ in range(1 if index % 4 else 2)],
+            })
+        return commits_data
+
+    @staticmethod
+    def build_legacy_changes(commits_data: List[dict]) -> List[LegacyChange]:
+        changes = []
+        for data in commits_data:
+            commit = LegacyCommit(data['id'], data['title'], dateutil.parser.parse(data['created_at']), data['parent_ids'])
+            jira_issue = LegacyJiraIssue(commit.jira_reference, 'Summary', ['label']) if commit.jira_reference else None
+            changes.append(LegacyChange(commit, jira_issue, []))
+        return changes
+
+    @staticmethod
+    def build_changes(commits_data: List[dict]) -> List[Change]:
+        changes = []
+        for data in commits_data:
+            commit = Commit(data['id'], data['title'], data['created_at'], data['parent_ids'])
+            jira_issue = JiraIssue(commit.jira_reference, 'Summary', ['label']) if commit.jira_reference else None
+            changes.append(Change(commit, jira_issue, []))
+        return changes
+
+    @staticmethod
+    def render(changes: list) -> int:
+        """Touch the attributes read while getting changes and rendering them, returning the number of values read"""
+        values = []
+        for change in changes:
+            values += (change.commit.jira_reference, change.commit.jira_reference, change.commit.message, change.commit.id)
+            values += (len(change.commit.parent_ids), len(change.commit.parent_ids), len(change.commit.parent_ids))
+        return len(values)
+
+    @staticmethod
+    def measure_time(fn: Callable, repeat: int) -> float:
+        times = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started_at)
+        return min(times)
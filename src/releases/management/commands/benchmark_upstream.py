@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import (
+    BaseHTTPRequestHandler,
+    HTTPServer,
+)
+from typing import (
+    List,
+    Tuple,
+)
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from releases.domain.merge_requests import MergeRequest
+from releases.domain.projects import Project
+from releases.executor import get_executor
+from releases.snapshots import SnapshotBuilder
+
+
+def get_sha(*parts) -> str:
+    return hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+class FakeUpstreamServer(socketserver.ThreadingMixIn, HTTPServer):
+
+    """A local HTTP server answering the GitLab and Jira API calls made while building snapshots, each after ``latency`` seconds"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, commits_per_range: int):
+        super().__init__(('127.0.0.1', 0), FakeUpstreamRequestHandler)
+        self.latency = latency
+        self.commits_per_range = commits_per_range
+        self.request_count = 0
+        self.request_count_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-upstream-server', daemon=True).start()
+
+    def get_commits(self, gitlab_id: str, target_sha: str, source_sha: str) -> List[dict]:
+        """Return a chain of commits from ``target_sha`` to ``source_sha``, the latest first"""
+        commits = []
+        parent_id = target_sha
+        for index in range(self.commits_per_range):
+            commit_id = source_sha if index == self.commits_per_range - 1 else get_sha(gitlab_id, target_sha, source_sha, index)
+            commits.append({
+                'id': commit_id,
+                'title': f'[ABC-{int(commit_id[:6], 16) % 5000}] Change {index}',
+                'created_at': f'2020-01-01T00:{index // 60 % 60:02}:{index % 60:02}.000+01:00',
+                'parent_ids': [parent_id],
+            })
+            parent_id = commit_id
+        return commits[::-1]
+
+
+class FakeUpstreamRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keeps connections alive
+
+    GITLAB_PATH_PATTERN = re.compile(r'^/api/v4/projects/(?P<gitlab_id>[^/]+)/repository/(?P<resource>.+)$')
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        time.sleep(self.server.latency)
+        with self.server.request_count_lock:
+            self.server.request_count += 1
+        match = self.GITLAB_PATH_PATTERN.match(url.path)
+        if match:
+            self.respond_gitlab(urllib.parse.unquote(match.group('gitlab_id')), match.group('resource'), query)
+        elif url.path == '/rest/api/2/search':
+            keys = re.findall(r'[A-Z]+-\d+', query.get('jql', ''))
+            self.respond({'issues': [{'key': key, 'fields': {'summary': f'Issue {key}', 'labels': []}} for key in keys]})
+        elif url.path == '/rest/api/2/serverInfo':
+            self.respond({'versionNumbers': [8, 0, 0], 'deploymentType': 'Server', 'version': '8.0.0'})
+        elif url.path == '/rest/api/2/field':
+            self.respond([])
+        elif url.path == '/rest/auth/1/session':
+            self.respond({'name': 'benchmark'})
+        else:
+            self.respond({'message': 'Not found'}, status=404)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.respond({'session': {'name': 'JSESSIONID', 'value': 'benchmark'}})
+
+    def respond_gitlab(self, gitlab_id: str, resource: str, query: dict):
+        if resource == 'tags':
+            self.respond([{'name': 'v1.0.0'}])
+        elif resource == 'tree':
+            self.respond([{'id': get_sha(gitlab_id, 'tree', query['ref']), 'name': 'README.md', 'type': 'blob', 'mode': '100644'}])
+        elif resource == 'merge_base':
+            self.respond({'id': get_sha(gitlab_id, 'merge-base')})
+        elif resource == 'commits':
+            target_sha, source_sha = query['ref_name'].split('..')
+            commits = self.server.get_commits(gitlab_id, target_sha, source_sha)
+            page, per_page = int(query.get('page', 1)), int(query.get('per_page', 20))
+            total_pages = max(1, -(-len(commits) // per_page))
+            headers = {'X-Page': str(page), 'X-Total-Pages': str(total_pages), 'X-Total': str(len(commits))}
+            if page < total_pages:
+                headers['X-Next-Page'] = str(page + 1)
+                next_query = urllib.parse.urlencode({**query, 'page': page + 1})
+                headers['Link'] = f'<{self.server.url}{urllib.parse.urlsplit(self.path).path}?{next_query}>; rel="next"'
+            self.respond(commits[(page - 1) * per_page:page * per_page], headers=headers)
+        elif resource.startswith('commits/'):
+            self.respond({'id': get_sha(gitlab_id, urllib.parse.unquote(resource[len('commits/'):]))})
+        else:
+            self.respond({'message': 'Not found'}, status=404)
+
+    def respond(self, data, status: int = 200, headers: dict = None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+
+    help = 'Measures building snapshots against a local fake GitLab and Jira with the thread pool and with the asyncio engines.'
+
+    ENGINES: List[Tuple[str, str]] = [('api', 'api'), ('async', 'async')]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=20, help='Number of projects')
+        parser.add_argument('--commits', type=int, default=250, help='Number of commits in each range')
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds the fake server takes to answer a request')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of runs to take the best time of')
+
+    def handle(self, *args, **options):
+        server = FakeUpstreamServer(latency=options['latency'], commits_per_range=options['commits'])
+        server.start()
+        projects = [self.make_project(index) for index in range(options['projects'])]
+        for gitlab_engine, jira_engine in self.ENGINES:
+            with override_settings(
+                GITLAB_HOST=server.url,
+                GITLAB_ENGINE=gitlab_engine,
+                GITLAB_REF_CACHE_TTL=0,
+                JIRA_HOST=server.url,
+                JIRA_USERNAME='benchmark',
+                JIRA_PASSWORD='benchmark',
+                JIRA_ENGINE=jira_engine,
+                JIRA_ISSUE_TTL=0,
+            ):
+                times = []
+                for _ in range(options['repeat']):
+                    caches['default'].clear()
+                    server.request_count = 0
+                    started_at = time.perf_counter()
+                    self.build_snapshots(projects)
+                    times.append(time.perf_counter() - started_at)
+                self.stdout.write(
+                    f'GitLab {gitlab_engine:6} Jira {jira_engine:6} {min(times):8.2f} s   '
+                    f'{server.request_count} requests   {threading.active_count()} threads'
+                )
+        server.shutdown()
+
+    @staticmethod
+    def make_project(index: int) -> Project:
+        return Project(
+            name=f'Project {index}',
+            gitlab_id=f'group/project-{index}',
+            production_environment_branch='master',
+            merge_requests=[
+                MergeRequest(MergeRequest.MergeType.DEV, 'develop', 'stage'),
+                MergeRequest(MergeRequest.MergeType.PROD, 'stage', 'master'),
+                MergeRequest(MergeRequest.MergeType.MAINTENANCE, 'master', 'maintenance'),
+            ],
+            versioning_scheme='INCREMENTING_SEGMENTS',
+            tag_group=None,
+            production_release_jira_transitions=[],
+            jira_warning_labels=[],
+        )
+
+    @staticmethod
+    def build_snapshots(projects: List[Project]):
+        batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        for task in SnapshotBuilder().build_snapshots(projects, batch).values():
+            task.result()
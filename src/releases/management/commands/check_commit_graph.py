@@ -0,0 +1,106 @@
+import random
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from releases.commit_graph import CommitGraph
+from releases.domain.commits import Commit
+from releases.executor import TaskBatch
+
+
+class InMemoryEngine:
+
+    """Answers the calls of CommitGraph from a history in memory, with merge bases of two commits like GitLab"""
+
+    def __init__(self, parent_ids: Dict[str, List[str]]):
+        self.commits = {
+            commit_id: Commit(commit_id, f'Change {index}', '2020-01-01T00:00:00.000+01:00', commit_parent_ids)
+            for index, (commit_id, commit_parent_ids) in enumerate(parent_ids.items())
+        }
+        self._ancestors = {}
+
+    def get_ancestors(self, sha: str) -> Set[str]:
+        if sha not in self._ancestors:
+            ancestors = {sha}
+            for parent_id in self.commits[sha].parent_ids:
+                ancestors |= self.get_ancestors(parent_id)
+            self._ancestors[sha] = ancestors
+        return self._ancestors[sha]
+
+    def get_merge_base(self, project, shas: List[str]) -> str:
+        source_sha, target_sha = shas
+        common_ancestors = self.get_ancestors(source_sha) & self.get_ancestors(target_sha)
+        return next(
+            sha for sha in reversed(list(self.commits))
+            if sha in common_ancestors and not any(sha != other and sha in self.get_ancestors(other) for other in common_ancestors)
+        )
+
+    def get_commit_log(self, project, source_sha: str, target_sha: str) -> List[Commit]:
+        commit_ids = self.get_ancestors(source_sha) - self.get_ancestors(target_sha)
+        return [commit for commit_id, commit in self.commits.items() if commit_id in commit_ids]
+
+    def get_commit_logs(self, project, ranges: List[Tuple[str, str]], batch: Optional[TaskBatch] = None) -> List[List[Commit]]:
+        return [self.get_commit_log(project, source_sha, target_sha) for source_sha, target_sha in ranges]
+
+
+class Command(BaseCommand):
+
+    help = 'Checks ranges answered by the commit graph against commit logs read range by range, over random histories.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=1000, help='Number of random histories')
+        parser.add_argument('--commits', type=int, default=40, help='Number of commits in each history')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random histories')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        failures = 0
+        for case in range(options['cases']):
+            engine = InMemoryEngine(self.make_parent_ids(options['commits']))
+            refs = random.sample(list(engine.commits), random.randint(2, 6))
+            ranges = [(source_sha, target_sha) for source_sha in refs for target_sha in refs if source_sha != target_sha]
+            ranges = random.sample(ranges, random.randint(2, len(ranges)))
+            # targets first, like GitlabClient.compare_missing_ranges
+            commit_graph = CommitGraph.build(engine, None, [sha for range_shas in ranges for sha in reversed(range_shas)])
+            for source_sha, target_sha in ranges:
+                error = self.check_commit_log(
+                    commit_graph.get_commit_log(source_sha, target_sha),
+                    engine.get_commit_log(None, source_sha, target_sha),
+                )
+                if error:
+                    failures += 1
+                    self.stderr.write(f'Case {case}, range {target_sha}..{source_sha}: {error}')
+        if failures:
+            raise CommandError(f'{failures} ranges of {options["cases"]} histories did not match.')
+        self.stdout.write(f'All ranges of {options["cases"]} histories matched.')
+
+    @staticmethod
+    def make_parent_ids(count: int) -> Dict[str, List[str]]:
+        """Return parents of commits by their ids, the parents first, with merges of branches of a single root commit"""
+        parent_ids = {}
+        for index in range(count):
+            commit_ids = list(parent_ids)
+            parent_count = 0 if index == 0 else 2 if index > 1 and random.random() < 0.25 else 1
+            parent_ids[f'{index:040x}'] = random.sample(commit_ids[-10:], parent_count)
+        return parent_ids
+
+    @staticmethod
+    def check_commit_log(commit_log: List[Commit], expected_commit_log: List[Commit]) -> Optional[str]:
+        """Return what is wrong with the commit log, which has to hold the same commits, never listing one before its parents"""
+        commit_ids = [commit.id for commit in commit_log]
+        expected_commit_ids = [commit.id for commit in expected_commit_log]
+        if sorted(commit_ids) != sorted(expected_commit_ids):
+            return f'got {len(commit_ids)} commits instead of {len(expected_commit_ids)}'
+        positions = {commit_id: position for position, commit_id in enumerate(commit_ids)}
+        if any(positions.get(parent_id, -1) > positions[commit.id] for commit in commit_log for parent_id in commit.parent_ids):
+            return 'a commit is listed before its parents'
+        return None
@@ -0,0 +1,301 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import (
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from django.conf import settings
+
+from .changes import ChangesGettingMixin
+from .domain.changes import Change
+from .domain.projects import Project
+from .executor import get_executor
+from .jira import JiraClient
+from .rocket import RocketClient
+from .sqlite_store import SQLiteStore
+from .throttling import (
+    Priority,
+    prioritized,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class PostDeploymentJob:
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    def __init__(
+        self,
+        job_id: str,
+        project_gitlab_id: str,
+        tag: str,
+        previous_tag: str,
+        status: str,
+        message: str,
+        created_at: float,
+        updated_at: float,
+    ):
+        self.job_id = job_id
+        self.project_gitlab_id = project_gitlab_id
+        self.tag = tag
+        self.previous_tag = previous_tag
+        self.status = status
+        self.message = message
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+
+class PostDeploymentJobStore(SQLiteStore):
+
+    """Persistent queue of post-deployment jobs shared by all application processes through a single SQLite file.
+
+    There is a single job per project and tag, so that a retried CI job does not transition Jira issues again. A failed job runs
+    again when enqueued again, transitioning only the issues that were not transitioned by the former runs. A job is run by the
+    process that claims it first. Jobs left queued by a process that exited are scheduled again after ``QUEUED_STALE_AFTER`` seconds,
+    which is harmless as only one of the schedules claims the job. A running job is touched every ``HEARTBEAT_INTERVAL`` seconds for
+    as long as it runs, so one that has not been touched for ``RUNNING_STALE_AFTER`` seconds was left by a process that exited and is
+    claimed again.
+    """
+
+    QUEUED_STALE_AFTER = 60
+    HEARTBEAT_INTERVAL = 60
+    RUNNING_STALE_AFTER = 5 * 60
+
+    STALE_CONDITION = '(status = ? AND updated_at < ? OR status = ? AND updated_at < ?)'
+
+    COLUMNS = 'job_id, project_gitlab_id, tag, previous_tag, status, message, created_at, updated_at'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS post_deployment_jobs ('
+        'job_id TEXT PRIMARY KEY, project_gitlab_id TEXT NOT NULL, tag TEXT NOT NULL, previous_tag TEXT NOT NULL, '
+        'status TEXT NOT NULL, message TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL, '
+        'UNIQUE (project_gitlab_id, tag)'
+        ');'
+        'CREATE TABLE IF NOT EXISTS post_deployment_transitioned_issues ('
+        'job_id TEXT NOT NULL, issue_key TEXT NOT NULL, transitioned_at REAL NOT NULL, PRIMARY KEY (job_id, issue_key)'
+        ');'
+    )
+
+    def enqueue(self, project_gitlab_id: str, tag: str, previous_tag: str) -> Tuple[PostDeploymentJob, bool]:
+        """Return the job of the project and tag, and whether it is to be scheduled, being created now, failed or stale"""
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                f'INSERT OR IGNORE INTO post_deployment_jobs ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (uuid.uuid4().hex, project_gitlab_id, tag, previous_tag, PostDeploymentJob.STATUS_QUEUED, '', now, now),
+            )
+            if cursor.rowcount != 1:
+                cursor = self.connection.execute(
+                    'UPDATE post_deployment_jobs SET previous_tag = ?, status = ?, message = ?, updated_at = ? '
+                    f'WHERE project_gitlab_id = ? AND tag = ? AND (status = ? OR {self.STALE_CONDITION})',
+                    (previous_tag, PostDeploymentJob.STATUS_QUEUED, '', now, project_gitlab_id, tag, PostDeploymentJob.STATUS_FAILED)
+                    + self.get_stale_parameters(now),
+                )
+        row = self.connection.execute(
+            f'SELECT {self.COLUMNS} FROM post_deployment_jobs WHERE project_gitlab_id = ? AND tag = ?',
+            (project_gitlab_id, tag),
+        ).fetchone()
+        return PostDeploymentJob(*row), cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[PostDeploymentJob]:
+        row = self.connection.execute(f'SELECT {self.COLUMNS} FROM post_deployment_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return PostDeploymentJob(*row) if row else None
+
+    def claim(self, job_id: str) -> Optional[PostDeploymentJob]:
+        """Mark the job running and return it, unless it is finished or being run already"""
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                'UPDATE post_deployment_jobs SET status = ?, updated_at = ? '
+                'WHERE job_id = ? AND (status = ? OR status = ? AND updated_at < ?)',
+                (
+                    PostDeploymentJob.STATUS_RUNNING, now, job_id,
+                    PostDeploymentJob.STATUS_QUEUED, PostDeploymentJob.STATUS_RUNNING, now - self.RUNNING_STALE_AFTER,
+                ),
+            )
+        return self.get(job_id) if cursor.rowcount == 1 else None
+
+    def touch(self, job_id: str):
+        """Tell that the running job is still being run"""
+        with self.connection:
+            self.connection.execute(
+                'UPDATE post_deployment_jobs SET updated_at = ? WHERE job_id = ? AND status = ?',
+                (time.time(), job_id, PostDeploymentJob.STATUS_RUNNING),
+            )
+
+    def finish(self, job_id: str, status: str, message: str):
+        with self.connection:
+            self.connection.execute(
+                'UPDATE post_deployment_jobs SET status = ?, message = ?, updated_at = ? WHERE job_id = ?',
+                (status, message, time.time(), job_id),
+            )
+
+    def get_transitioned_issue_keys(self, job_id: str) -> Set[str]:
+        rows = self.connection.execute('SELECT issue_key FROM post_deployment_transitioned_issues WHERE job_id = ?', (job_id,))
+        return {issue_key for issue_key, in rows}
+
+    def add_transitioned_issue_key(self, job_id: str, issue_key: str):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO post_deployment_transitioned_issues (job_id, issue_key, transitioned_at) VALUES (?, ?, ?)',
+                (job_id, issue_key, time.time()),
+            )
+
+    def get_stale_job_ids(self) -> List[str]:
+        rows = self.connection.execute(
+            f'SELECT job_id FROM post_deployment_jobs WHERE {self.STALE_CONDITION} ORDER BY created_at',
+            self.get_stale_parameters(time.time()),
+        )
+        return [job_id for job_id, in rows]
+
+    def is_stale(self, job: PostDeploymentJob) -> bool:
+        """Return whether the job was left queued or running by a process that exited, judging by when it was last updated"""
+        if job.status == PostDeploymentJob.STATUS_QUEUED:
+            return job.updated_at < time.time() - self.QUEUED_STALE_AFTER
+        if job.status == PostDeploymentJob.STATUS_RUNNING:
+            return job.updated_at < time.time() - self.RUNNING_STALE_AFTER
+        return False
+
+    def get_stale_parameters(self, now: float) -> Tuple[str, float, str, float]:
+        """Return parameters of ``STALE_CONDITION``"""
+        return (
+            PostDeploymentJob.STATUS_QUEUED, now - self.QUEUED_STALE_AFTER,
+            PostDeploymentJob.STATUS_RUNNING, now - self.RUNNING_STALE_AFTER,
+        )
+
+
+class PostDeploymentHook(ChangesGettingMixin):
+
+    """Makes the production release Jira transitions of issues of a deployed tag, in the shared thread pool"""
+
+    def enqueue(self, project: Project, tag: str, previous_tag: str) -> Tuple[PostDeploymentJob, bool]:
+        """Return the job of the project and tag, scheduling it if it was created now, failed or is stale"""
+        job, is_scheduled = get_post_deployment_job_store().enqueue(project.gitlab_id, tag, previous_tag)
+        if is_scheduled:
+            self.schedule(job.job_id)
+        return job, is_scheduled
+
+    def resume_if_stale(self, job: PostDeploymentJob):
+        """Schedule the job again if the process running it exited, eg. when polled for its status"""
+        if get_post_deployment_job_store().is_stale(job):
+            logger.info('Resuming post deployment hook for %s %s', job.project_gitlab_id, job.tag)
+            self.schedule(job.job_id)
+
+    def schedule(self, job_id: str):
+        # CI waits for the job, unlike the visitors of the dashboard
+        with prioritized(Priority.BACKGROUND):
+            get_executor().submit(self.run, job_id)
+
+    def run(self, job_id: str):
+        job_store = get_post_deployment_job_store()
+        job = job_store.claim(job_id)
+        if job is None:
+            return
+        with self.keep_claimed(job_id):
+            try:
+                project = next(project for project in settings.PROJECTS if project.gitlab_id == job.project_gitlab_id)
+                changes = self.get_changes(project, job.tag, job.previous_tag)
+                success_messages, error_messages = self.transition_jira_issues(job_id, project, changes)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception('Got an error while running post deployment hook for %s %s', job.project_gitlab_id, job.tag)
+                success_messages, error_messages = [], [f'An error occurred: {e}']
+                project = job.project_gitlab_id
+            rocket_client = RocketClient()
+            if error_messages:
+                message = f'Post deployment hook for {project} failed.\n' + '\n'.join(success_messages + error_messages)
+                rocket_client.send_message(message, color='red')
+                job_store.finish(job_id, PostDeploymentJob.STATUS_FAILED, message)
+            else:
+                message = f'Post deployment hook for {project} succeeded.\n' + '\n'.join(success_messages)
+                rocket_client.send_message(message, color='green')
+                job_store.finish(job_id, PostDeploymentJob.STATUS_SUCCEEDED, message)
+
+    @staticmethod
+    @contextmanager
+    def keep_claimed(job_id: str) -> Iterator[None]:
+        """Touch the running job in a background thread until the block exits, so that it does not look stale however long it runs"""
+        job_store = get_post_deployment_job_store()
+        stopped = threading.Event()
+
+        def touch():
+            while not stopped.wait(job_store.HEARTBEAT_INTERVAL):
+                try:
+                    job_store.touch(job_id)
+                except sqlite3.Error:
+                    logger.exception('Got an error while touching post deployment job %s', job_id)
+
+        thread = threading.Thread(target=touch, name='releases-post-deployment-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def transition_jira_issues(self, job_id: str, project: Project, changes: List[Change]) -> Tuple[List[str], List[str]]:
+        """Transition issues of the changes, but those transitioned by former runs of the job, which count as transitioned"""
+        job_store = get_post_deployment_job_store()
+        issues_with_transitions, issues_without_transitions = [], []
+        issue_lists_by_success = {True: issues_with_transitions, False: issues_without_transitions}
+        jira_issue_keys = {change.jira_issue.key for change in changes if change.jira_issue}
+        transitioned_issue_keys = job_store.get_transitioned_issue_keys(job_id)
+        batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        transition_tasks = {
+            jira_issue_key: batch.submit(self.transition_jira_issue, job_id, jira_issue_key, project.production_release_jira_transitions)
+            for jira_issue_key in jira_issue_keys - transitioned_issue_keys
+        }
+        issues_with_transitions.extend(jira_issue_keys & transitioned_issue_keys)
+        for jira_issue_key, transition_task in transition_tasks.items():
+            issue_lists_by_success[transition_task.result()].append(jira_issue_key)
+        success_messages, error_messages = [], []
+        if issues_with_transitions:
+            success_messages.append(f"Successfully transitioned issues: {', '.join(issues_with_transitions)}.")
+        if issues_without_transitions:
+            error_messages.append(f"Could not transition issues: {', '.join(issues_without_transitions)}. Please handle it manually.")
+        return success_messages, error_messages
+
+    @staticmethod
+    def transition_jira_issue(job_id: str, issue_key: str, transition_names: List[str]) -> bool:
+        """Make the transitions of the issue, storing that the job must not transition the issue again if any was made"""
+        transitions_succeeded = bool(JiraClient().make_transitions(issue_key=issue_key, transition_names=transition_names))
+        if transitions_succeeded:
+            get_post_deployment_job_store().add_transitioned_issue_key(job_id, issue_key)
+        return transitions_succeeded
+
+
+_store: Optional[PostDeploymentJobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_post_deployment_job_store() -> PostDeploymentJobStore:
+    global _store  # pylint: disable=global-statement
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PostDeploymentJobStore(path=os.path.join(settings.STORAGE_DIR, 'post-deployment-jobs.sqlite3'))
+    return _store
+
+
+def resume_post_deployment_jobs():
+    """Schedule jobs left behind by processes that exited, eg. on a restart"""
+    hook = PostDeploymentHook()
+    for job_id in get_post_deployment_job_store().get_stale_job_ids():
+        hook.schedule(job_id)
@@ -1,7 +1,17 @@
+import logging
+import threading
+from typing import Optional
+
 import requests
 
 from django.conf import settings
 
+from .circuit_breaker import is_degraded
+from .http import mount_connection_pool
+
+
+logger = logging.getLogger(__name__)
+
 
 class RocketClient:
 
@@ -9,18 +19,40 @@ class RocketClient:
     def is_configured_properly(cls) -> bool:
         return bool(settings.ROCKET_HOOK_URL)
 
+    @classmethod
+    def is_degraded(cls) -> bool:
+        return is_degraded(settings.ROCKET_HOOK_URL)
+
     def send_message(self, message: str, color: str = 'black'):
+        """Send the message if possible, as a failed notification should not fail the action it notifies of"""
         if self.is_configured_properly():
-            response = requests.post(
-                settings.ROCKET_HOOK_URL,
-                json={
-                    "text": "",
-                    "attachments": [{
-                        "author_name": "Release Manager",
-                        "color": color,
-                        "thumb_url": None,
-                        "text": message,
-                    }]
-                }
-            )
-            response.raise_for_status()
+            try:
+                response = get_rocket_session().post(
+                    settings.ROCKET_HOOK_URL,
+                    json={
+                        "text": "",
+                        "attachments": [{
+                            "author_name": "Release Manager",
+                            "color": color,
+                            "thumb_url": None,
+                            "text": message,
+                        }]
+                    }
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException:
+                logger.exception('Got an error while sending a message to Rocket.Chat: %s', message)
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_rocket_session() -> requests.Session:
+    """Return the HTTP session shared by all threads of the process, so that connections are kept alive between messages"""
+    global _session  # pylint: disable=global-statement
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = mount_connection_pool(requests.Session())
+    return _session
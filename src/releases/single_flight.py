@@ -0,0 +1,96 @@
+import hashlib
+import os
+import threading
+import time
+from collections import (
+    Counter,
+    defaultdict,
+)
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    Dict,
+)
+
+from .cache import NamespacedCache
+
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def record(name: str, event: str):
+    with _stats_lock:
+        _stats[name][event] += 1
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {name: dict(counter) for name, counter in _stats.items()}
+
+
+class SingleFlight:
+
+    """Makes concurrent identical calls share a single upstream call and its result.
+
+    Callers within a process wait for the call already running in another thread. Across processes the first caller takes a lock in the
+    shared cache and publishes the result there for a moment, while callers from other processes poll for it, up to ``WAIT_TIMEOUT``
+    seconds, before making the call themselves.
+    """
+
+    WAIT_TIMEOUT = 30
+    POLL_INTERVAL = 0.05
+    RESULT_TTL = 10
+
+    lock_cache = NamespacedCache('single-flight-lock')
+    result_cache = NamespacedCache('single-flight-result')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        key = f'{self.name}:{hashlib.sha1(key.encode()).hexdigest()}'
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._calls[key] = Future()
+        if not is_leader:
+            record(self.name, 'coalesced')
+            return future.result()
+        record(self.name, 'calls')
+        try:
+            result = self.do_once_across_processes(key, fn, args, kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do_once_across_processes(self, key: str, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        if self.lock_cache.add(key, os.getpid(), timeout=self.WAIT_TIMEOUT):
+            self.result_cache.delete(key)  # left by a previous call
+            try:
+                result = fn(*args, **kwargs)
+                self.result_cache.set(key, (result,), timeout=self.RESULT_TTL)  # wrapped, so that None is told from a miss
+                return result
+            finally:
+                self.lock_cache.delete(key)
+        deadline = time.monotonic() + self.WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            is_running = self.lock_cache.get(key) is not None
+            shared_result = self.result_cache.get(key)
+            if shared_result is not None:
+                record(self.name, 'coalesced across processes')
+                return shared_result[0]
+            if not is_running:
+                break  # the call failed or its result is gone already
+        return fn(*args, **kwargs)
@@ -0,0 +1,210 @@
+import fcntl
+import logging
+import os
+import threading
+from datetime import (
+    datetime,
+    timedelta,
+)
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import NamespacedCache
+from .changes import ChangesGettingMixin
+from .domain.changes import Change
+from .domain.projects import Project
+from .domain.tags import Tag
+from .executor import (
+    Task,
+    TaskBatch,
+    get_executor,
+)
+from .gitlab import GitlabClient
+from .throttling import (
+    Priority,
+    prioritized,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectSnapshot:
+
+    """Precomputed dashboard state of a single project."""
+
+    def __init__(
+        self,
+        project_gitlab_id: str,
+        latest_tag: Optional[Tag],
+        merge_requests_changes: List[List[Change]],
+        tag_changes: List[Change],
+        built_at: datetime,
+    ):
+        self.project_gitlab_id = project_gitlab_id
+        self.latest_tag = latest_tag
+        self.merge_requests_changes = merge_requests_changes
+        self.tag_changes = tag_changes
+        self.built_at = built_at
+
+    @property
+    def age(self) -> timedelta:
+        return timezone.now() - self.built_at
+
+
+class SnapshotBuilder(ChangesGettingMixin):
+
+    snapshot_cache = NamespacedCache('snapshot')
+    refresh_lock_cache = NamespacedCache('snapshot-lock')
+
+    # the refresher rebuilds snapshots every interval, after rebuilding them all, so they get older than an interval on their own
+    REFRESH_GRACE_INTERVALS = 2
+
+    _building_tasks: Dict[str, Task] = {}
+    _building_tasks_lock = threading.Lock()
+
+    def get_snapshots(self, projects: Iterable[Project]) -> Dict[Project, ProjectSnapshot]:
+        projects_by_gitlab_id = {project.gitlab_id: project for project in projects}
+        snapshots = self.snapshot_cache.get_many(projects_by_gitlab_id)
+        return {projects_by_gitlab_id[gitlab_id]: snapshot for gitlab_id, snapshot in snapshots.items()}
+
+    def invalidate_snapshot(self, project: Project):
+        self.snapshot_cache.delete(project.gitlab_id)
+
+    def build_snapshots(self, projects: Iterable[Project], batch: TaskBatch) -> Dict[Project, Task]:
+        """Schedule building snapshots of the projects, each stored in the cache as soon as it is ready"""
+        gitlab_client = GitlabClient()
+        projects = list(projects)
+        latest_tag_tasks = {p: batch.submit(gitlab_client.get_latest_tag, p) for p in projects}
+        changes_tasks = {p: batch.submit(self.get_project_changes, p, latest_tag_tasks[p], batch) for p in projects}
+        snapshot_tasks = {p: batch.submit(self.collect_snapshot, p, latest_tag_tasks[p], changes_tasks[p]) for p in projects}
+        with self._building_tasks_lock:
+            self._building_tasks.update((p.gitlab_id, task) for p, task in snapshot_tasks.items())
+        for project, task in snapshot_tasks.items():
+            task.add_done_callback(lambda task, project=project: self.forget_building_task(project, task))
+        return snapshot_tasks
+
+    def get_building_tasks(self, projects: Iterable[Project]) -> Dict[Project, Task]:
+        """Return tasks of snapshots of the projects being built in the process, eg. for a request that did not wait for them"""
+        with self._building_tasks_lock:
+            return {p: self._building_tasks[p.gitlab_id] for p in projects if p.gitlab_id in self._building_tasks}
+
+    def forget_building_task(self, project: Project, task: Task):
+        with self._building_tasks_lock:
+            if self._building_tasks.get(project.gitlab_id) is task:
+                del self._building_tasks[project.gitlab_id]
+
+    def is_overdue(self, snapshot: ProjectSnapshot) -> bool:
+        """Tell whether the snapshot should have been rebuilt by the refresher by now, so that a visit has to refresh it"""
+        return snapshot.age.total_seconds() > self.REFRESH_GRACE_INTERVALS * settings.SNAPSHOT_REFRESH_INTERVAL
+
+    def refresh_snapshots_in_background(self, projects: Iterable[Project]):
+        """Schedule rebuilding snapshots of the projects, unless some process is rebuilding them already"""
+        self.rebuild_snapshots_in_background(
+            p for p in projects if self.refresh_lock_cache.add(p.gitlab_id, os.getpid(), timeout=settings.SNAPSHOT_REFRESH_INTERVAL)
+        )
+
+    def rebuild_snapshots_in_background(self, projects: Iterable[Project]):
+        projects = list(projects)
+        if projects:
+            with prioritized(Priority.BACKGROUND):
+                tasks = self.build_snapshots(projects, get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY))
+            for project, task in tasks.items():
+                task.add_done_callback(lambda task, project=project: self.log_failure(project, task))
+
+    @staticmethod
+    def log_failure(project: Project, task: Task):
+        if not task.future.cancelled() and task.future.exception():
+            logger.error('Got an error while building a snapshot of project %s', project, exc_info=task.future.exception())
+
+    def get_project_changes(self, project: Project, latest_tag_task: Task, batch: TaskBatch) -> Tuple[List[List[Change]], List[Change]]:
+        """Return changes of merge requests and changes since the latest tag, all read together as their ranges overlap, each range
+        read concurrently in the batch"""
+        ranges = [(mr.source_branch, mr.target_branch) for mr in project.merge_requests]
+        latest_tag = latest_tag_task.result()
+        if latest_tag:
+            ranges.insert(0, (project.production_environment_branch, str(latest_tag)))
+        changes = self.get_many_changes(project, ranges, batch)
+        return (changes[1:], changes[0]) if latest_tag else (changes, [])
+
+    def collect_snapshot(self, project: Project, latest_tag_task: Task, changes_task: Task) -> ProjectSnapshot:
+        merge_requests_changes, tag_changes = changes_task.result()
+        snapshot = ProjectSnapshot(
+            project_gitlab_id=project.gitlab_id,
+            latest_tag=latest_tag_task.result(),
+            merge_requests_changes=merge_requests_changes,
+            tag_changes=tag_changes,
+            built_at=timezone.now(),
+        )
+        self.snapshot_cache.set(project.gitlab_id, snapshot, timeout=None)
+        return snapshot
+
+
+class SnapshotRefresher(threading.Thread):
+
+    """A background thread rebuilding snapshots of all projects every SNAPSHOT_REFRESH_INTERVAL seconds.
+
+    Every application process runs one, but only the process holding the lock of a file in STORAGE_DIR does the work, whatever the
+    cache backend. The system releases the lock when the process exits, eg. when uWSGI recycles it, and another process takes it over
+    within an interval.
+    """
+
+    LOCK_FILE_NAME = 'snapshot-refresher.lock'
+
+    def __init__(self, interval: int):
+        super().__init__(name='releases-snapshot-refresher', daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        os.makedirs(settings.STORAGE_DIR, exist_ok=True)
+        with open(os.path.join(settings.STORAGE_DIR, self.LOCK_FILE_NAME), 'a') as lock_file:
+            while not self._stopped.is_set():
+                if self.try_lock(lock_file):
+                    try:
+                        self.refresh()
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception('Got an error while refreshing project snapshots')
+                self._stopped.wait(self.interval)
+
+    @staticmethod
+    def try_lock(lock_file) -> bool:
+        """Take the lock unless another process holds it, taking it again being a no-op"""
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def refresh(self):
+        builder = SnapshotBuilder()
+        with prioritized(Priority.BACKGROUND):
+            tasks = builder.build_snapshots(settings.PROJECTS, get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY))
+        for project, task in tasks.items():
+            try:
+                task.result()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Got an error while building a snapshot of project %s', project)
+
+    def stop(self):
+        self._stopped.set()
+
+
+_refresher: Optional[SnapshotRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def start_snapshot_refresher():
+    global _refresher  # pylint: disable=global-statement
+    with _refresher_lock:
+        if _refresher is None and settings.SNAPSHOT_REFRESH_INTERVAL:
+            _refresher = SnapshotRefresher(interval=settings.SNAPSHOT_REFRESH_INTERVAL)
+            _refresher.start()
@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+
+    """Base of stores shared by all application processes through a single SQLite file, with a connection per thread.
+
+    ``SCHEMA`` is run as a script when the store is created, so it has to create tables only if they do not exist.
+    """
+
+    SQLITE_TIMEOUT = 30
+    SCHEMA = ''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connection:
+            self.connection.executescript(self.SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.SQLITE_TIMEOUT)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
@@ -0,0 +1,243 @@
+import asyncio
+import enum
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    Mapping,
+    Optional,
+)
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_http_date_safe
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_local = threading.local()
+
+
+def get_priority() -> Priority:
+    """Return the priority of requests sent by the current thread, interactive unless set otherwise"""
+    return getattr(_local, 'priority', Priority.INTERACTIVE)
+
+
+@contextmanager
+def prioritized(priority: Priority) -> Iterator[None]:
+    previous_priority = get_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous_priority
+
+
+class HostThrottle:
+
+    """Limits requests of the process to a single host with a token bucket and an adaptive number of concurrent requests.
+
+    The bucket refills at ``rate`` tokens a second, or slower while the host reports a lower remaining quota in rate limit headers,
+    and no request is sent until a ``Retry-After`` or an exhausted quota resets. The number of concurrent requests grows by one with
+    every round of successful responses up to ``max_concurrency`` and halves when the host answers 429 (additive increase,
+    multiplicative decrease). Background requests wait for as long as any interactive request is waiting.
+
+    A request throttled with 429 was not processed and is sent again whatever its method. A 503 with ``Retry-After`` may come after
+    the host processed the request, so only requests of ``RETRIED_METHODS`` are sent again after it.
+    """
+
+    RETRIED_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+    DECREASE_INTERVAL = 1.0
+    DEFAULT_RETRY_DELAY = 1.0
+    WAIT_INTERVAL = 1.0
+    ASYNC_POLL_INTERVAL = 0.05
+
+    def __init__(self, host: str, rate: float, burst: int, max_concurrency: int, max_retries: int, max_retry_delay: float):
+        self.host = host
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.max_retry_delay = max_retry_delay
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self.stats = Counter()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = float('-inf')
+        self._quota_rate: Optional[float] = None
+        self._quota_reset_at = float('-inf')
+        self._decreased_at = float('-inf')
+        self._waiting = Counter()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority: Priority) -> Iterator[None]:
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                delay = self._acquire(priority)
+                if delay is not None:
+                    self.stats['waited'] += 1
+                while delay is not None:
+                    self._condition.wait(delay)
+                    delay = self._acquire(priority)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire_async(self, priority: Priority):
+        """Wait for a slot in the event loop, polling instead of blocking it, to be released with ``release``"""
+        with self._condition:
+            self._waiting[priority] += 1
+            delay = self._acquire(priority)
+            if delay is not None:
+                self.stats['waited'] += 1
+        try:
+            while delay is not None:
+                await asyncio.sleep(min(delay, self.ASYNC_POLL_INTERVAL))
+                with self._condition:
+                    delay = self._acquire(priority)
+        finally:
+            with self._condition:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def observe(self, method: str, status: int, headers: Mapping[str, str], attempt: int) -> bool:
+        """Adapt to a response of the host, returning whether the request should be sent again after being throttled"""
+        now = time.monotonic()
+        with self._condition:
+            self._update_quota(headers, now)
+            if status != 429 and not (status == 503 and 'Retry-After' in headers):
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                return False
+            self.stats['throttled'] += 1
+            if now - self._decreased_at >= self.DECREASE_INTERVAL:
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self._decreased_at = now
+            retry_delay = parse_delay(headers.get('Retry-After'))
+            retry_delay = self.DEFAULT_RETRY_DELAY if retry_delay is None else retry_delay
+            self._pause(now + retry_delay)
+            if attempt >= self.max_retries or retry_delay > self.max_retry_delay:
+                return False
+            if status != 429 and method.upper() not in self.RETRIED_METHODS:
+                return False
+            self.stats['retried'] += 1
+            return True
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                'concurrency': round(self.concurrency, 2),
+                'in_flight': self.in_flight,
+                'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 2),
+                **self.stats,
+            }
+
+    def _acquire(self, priority: Priority) -> Optional[float]:
+        """Take a slot and a token, or return how long to wait at most before trying again"""
+        now = time.monotonic()
+        rate = self._get_rate(now)
+        if rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+        if now < self._paused_until:
+            return self._paused_until - now
+        if priority != Priority.INTERACTIVE and self._waiting[Priority.INTERACTIVE]:
+            return self.WAIT_INTERVAL
+        if self.in_flight >= int(self.concurrency):
+            return self.WAIT_INTERVAL
+        if rate:
+            if self._tokens < 1:
+                return (1 - self._tokens) / rate
+            self._tokens -= 1
+        self.in_flight += 1
+        return None
+
+    def _get_rate(self, now: float) -> float:
+        rates = [self.rate] if self.rate else []
+        if self._quota_rate and now < self._quota_reset_at:
+            rates.append(self._quota_rate)
+        return min(rates, default=0)
+
+    def _update_quota(self, headers: Mapping[str, str], now: float):
+        """Spread the remaining quota reported by the host evenly until it resets, see eg. GitLab RateLimit-* headers"""
+        remaining = headers.get('RateLimit-Remaining', headers.get('X-RateLimit-Remaining'))
+        reset_delay = parse_delay(headers.get('RateLimit-Reset', headers.get('X-RateLimit-Reset')))
+        if remaining is None or not reset_delay:
+            return
+        try:
+            remaining = int(remaining)
+        except ValueError:
+            return
+        if remaining > 0:
+            self._quota_rate = remaining / reset_delay
+            self._quota_reset_at = now + reset_delay
+        else:
+            self._pause(now + reset_delay)
+
+    def _pause(self, until: float):
+        """Stop sending requests until the time, though never for longer than the longest delay worth retrying after"""
+        self._paused_until = max(self._paused_until, min(until, time.monotonic() + self.max_retry_delay))
+
+
+def parse_delay(value: Optional[str]) -> Optional[float]:
+    """Return seconds from now until the time given in seconds, a Unix timestamp, an HTTP date or an ISO date, if valid"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        timestamp = parse_http_date_safe(value)
+        if timestamp is None:
+            try:
+                moment = parse_datetime(value)
+            except ValueError:
+                moment = None
+            if moment is None or moment.tzinfo is None:
+                return None
+            timestamp = moment.timestamp()
+        return max(0.0, timestamp - time.time())
+    if seconds > 1e9:  # a Unix timestamp rather than a number of seconds
+        return max(0.0, seconds - time.time())
+    return max(0.0, seconds)
+
+
+_throttles: Dict[str, HostThrottle] = {}
+_throttles_lock = threading.Lock()
+
+
+def get_host_throttle(host: str) -> HostThrottle:
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = HostThrottle(
+                host=host,
+                rate=settings.HTTP_RATE_LIMIT,
+                burst=settings.HTTP_RATE_BURST,
+                max_concurrency=settings.HTTP_POOL_SIZE,
+                max_retries=settings.HTTP_MAX_RETRIES,
+                max_retry_delay=settings.HTTP_MAX_RETRY_DELAY,
+            )
+        return _throttles[host]
+
+
+def get_throttling_stats() -> Dict[str, Dict[str, float]]:
+    with _throttles_lock:
+        throttles = list(_throttles.values())
+    return {throttle.host: throttle.get_stats() for throttle in throttles}
@@ -7,7 +7,18 @@ from . import views
 app_name = 'releases'
 urlpatterns = [
     path('', views.ReleasesView.as_view(), name='releases'),
+    path('projects/<path:gitlab_id>/card/', views.ProjectCardView.as_view(), name='project-card'),
+    path(
+        'projects/<path:gitlab_id>/merge-requests/<int:merge_request_index>/changes/',
+        views.ChangesFragmentView.as_view(),
+        name='merge-request-changes',
+    ),
+    path('projects/<path:gitlab_id>/tag-changes/', views.ChangesFragmentView.as_view(), name='tag-changes'),
+    path('refresh-project/', views.RefreshProjectView.as_view(), name='refresh-project'),
     path('create-merge-request/', views.CreateMergeRequestView.as_view(), name='create-merge-request'),
     path('create-tag/', views.CreateTagView.as_view(), name='create-tag'),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
     path('post-deployment-hook/', csrf_exempt(views.PostDeploymentHookView.as_view()), name='post-deployment-hook'),
+    path('post-deployment-hook/jobs/<str:job_id>/', views.PostDeploymentJobView.as_view(), name='post-deployment-job'),
+    path('gitlab-webhook/', csrf_exempt(views.GitlabWebhookView.as_view()), name='gitlab-webhook'),
 ]
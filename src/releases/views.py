@@ -1,45 +1,89 @@
+import hmac
+import json
 import logging
+import os
+import re
+import time
 import urllib.parse
-from multiprocessing.pool import ThreadPool
+from concurrent.futures import (
+    TimeoutError as FuturesTimeoutError,
+    as_completed,
+)
 from operator import attrgetter
 from typing import (
+    Dict,
     Generator,
     List,
     Optional,
+    Set,
     Tuple,
 )
 
 import gitlab.exceptions
-from unstdlib import listify
 
 from django.conf import settings
 from django.contrib import messages
 from django.http import (
+    Http404,
+    HttpRequest,
     HttpResponse,
     HttpResponseBadRequest,
+    HttpResponseForbidden,
     HttpResponseRedirect,
+    JsonResponse,
+    QueryDict,
+    StreamingHttpResponse,
 )
+from django.middleware.csrf import get_token
 from django.shortcuts import (
     redirect,
+    render,
     resolve_url,
 )
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import escapejs
 from django.views.generic import (
     FormView,
     TemplateView,
+    View,
 )
 
+from .cache import (
+    get_backend_stats,
+    get_cache_stats,
+)
+from .changes import ChangesGettingMixin
+from .circuit_breaker import get_circuit_breaker_stats
 from .domain.changes import Change
 from .domain.merge_requests import MergeRequest
 from .domain.projects import Project
 from .domain.tags import Tag
+from .executor import (
+    Task,
+    get_executor,
+)
 from .forms import (
     MergeRequestForm,
     PostDeploymentHookForm,
+    ProjectFilterForm,
+    ProjectForm,
     TagForm,
 )
 from .gitlab import GitlabClient
 from .jira import JiraClient
+from .post_deployment import (
+    PostDeploymentHook,
+    PostDeploymentJob,
+    get_post_deployment_job_store,
+)
 from .rocket import RocketClient
+from .single_flight import get_single_flight_stats
+from .snapshots import (
+    ProjectSnapshot,
+    SnapshotBuilder,
+)
+from .throttling import get_throttling_stats
 from .versioning import (
     VersioningScheme,
     get_versioning_scheme,
@@ -49,64 +93,139 @@ from .versioning import (
 logger = logging.getLogger(__name__)
 
 
-class ChangesGettingMixin:
+class ProjectCardsMixin:
 
-    @listify
-    def get_changes(self, project: Project, source: str, target: str) -> Generator[Change, None, None]:
-        gitlab_client = GitlabClient()
-        difference = gitlab_client.compare_refs(project, source, target)
-        if difference.has_diff:
-            jira_client = JiraClient()
-            for commit in difference.commit_log:
-                jira_issue = jira_client.get_issue(commit.jira_reference) if commit.jira_reference else None
-                yield Change(
-                    commit=commit,
-                    jira_issue=jira_issue,
-                    warning_labels=list(set(project.jira_warning_labels) & set(jira_issue.labels if jira_issue else [])),
-                )
+    request: HttpRequest
 
+    @staticmethod
+    def get_project(gitlab_id: str) -> Project:
+        try:
+            return next((project for project in settings.PROJECTS if project.gitlab_id == gitlab_id))
+        except StopIteration:
+            raise Http404('Project not found.')
 
-class ReleasesView(TemplateView, ChangesGettingMixin):
+    @staticmethod
+    def get_tag_group_projects(project: Project) -> List[Project]:
+        """Return the project with all projects sharing tags with it"""
+        return [p for p in settings.PROJECTS if p == project or project.tag_group and p.tag_group == project.tag_group]
 
-    template_name = 'releases/releases.html'
+    @staticmethod
+    def get_snapshot_tasks(projects: List[Project]) -> Dict[Project, Task]:
+        snapshot_builder = SnapshotBuilder()
+        snapshots = snapshot_builder.get_snapshots(projects)
+        snapshot_builder.refresh_snapshots_in_background(p for p, snapshot in snapshots.items() if snapshot_builder.is_overdue(snapshot))
+        snapshot_tasks = {p: Task.from_result(snapshot) for p, snapshot in snapshots.items()}
+        snapshot_tasks.update(snapshot_builder.get_building_tasks(p for p in projects if p not in snapshots))
+        projects_without_snapshots = [p for p in projects if p not in snapshot_tasks]
+        if projects_without_snapshots:
+            batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+            snapshot_tasks.update(snapshot_builder.build_snapshots(projects_without_snapshots, batch))
+        return {p: snapshot_tasks[p] for p in projects}
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data()
-        warning_messages = []
-        if not JiraClient.is_configured_properly():
-            warning_messages.append('Jira configuration is not sufficient.')
-        if not RocketClient.is_configured_properly():
-            warning_messages.append('Rocket.chat configuration is not sufficient.')
-        pool = ThreadPool(processes=len(settings.PROJECTS))
-        projects_latest_tags = dict(pool.map(self.get_project_latest_tag, settings.PROJECTS))
-        tag_groups = {p.tag_group for p in settings.PROJECTS if p.tag_group}
-        latest_tag_group_tags = {
-            tag_group: max(latest_tag for p, latest_tag in projects_latest_tags.items() if p.tag_group == tag_group)
+    @staticmethod
+    def get_group_mates_latest_tag_tasks(projects: List[Project]) -> Dict[Project, Task]:
+        """Schedule getting latest tags of projects that share tags with the given projects, but are not given themselves
+
+        Only the latest tag of such project is needed, so its latest snapshot is used if available, with no other GitLab calls otherwise.
+        """
+        tag_groups = {p.tag_group for p in projects if p.tag_group}
+        group_mates = [p for p in settings.PROJECTS if p.tag_group in tag_groups and p not in projects]
+        snapshots = SnapshotBuilder().get_snapshots(group_mates)
+        gitlab_client = GitlabClient()
+        batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        return {
+            p: Task.from_result(snapshots[p].latest_tag) if p in snapshots else batch.submit(gitlab_client.get_latest_tag, p)
+            for p in group_mates
+        }
+
+    @staticmethod
+    def get_latest_tag_group_tags(latest_tags: Dict[Project, Optional[Tag]]) -> Dict[str, Optional[Tag]]:
+        tag_groups = {p.tag_group for p in latest_tags if p.tag_group}
+        return {
+            tag_group: max((tag for p, tag in latest_tags.items() if p.tag_group == tag_group and tag), default=None)
             for tag_group in tag_groups
         }
-        projects_latest_tag_group_tags = {p: latest_tag_group_tags.get(p.tag_group) for p in settings.PROJECTS}
-        projects_context = pool.starmap(
-            self.get_project_context_data,
-            [(p, projects_latest_tags.get(p), projects_latest_tag_group_tags.get(p)) for p in settings.PROJECTS]
-        )
-        context.update({
+
+    @staticmethod
+    def get_deadline() -> Optional[float]:
+        """Return the monotonic time by which the response should be sent, see DASHBOARD_TIME_BUDGET"""
+        return time.monotonic() + settings.DASHBOARD_TIME_BUDGET if settings.DASHBOARD_TIME_BUDGET else None
+
+    def iter_ready_projects(
+        self,
+        snapshot_tasks: Dict[Project, Task],
+        group_mates_latest_tag_tasks: Dict[Project, Task],
+        deadline: Optional[float],
+    ) -> Generator[Tuple[Project, Optional[ProjectSnapshot], Optional[Tag]], None, None]:
+        """Yield projects with their snapshots, None for those that failed, and the latest tags of their tag groups, in the order they get
+        ready until the deadline
+
+        A project is ready once the latest tags of all projects sharing tags with it are known. Tasks that are not done by the deadline
+        keep running, so that their snapshots are cached for the next request.
+        """
+        snapshot_projects = {task.future: p for p, task in snapshot_tasks.items()}
+        group_mate_projects = {task.future: p for p, task in group_mates_latest_tag_tasks.items()}
+        snapshots, latest_tags = {}, {}
+        projects_to_yield = set(snapshot_tasks)
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        try:
+            for future in as_completed(list(snapshot_projects) + list(group_mate_projects), timeout=timeout):
+                project = snapshot_projects.get(future) or group_mate_projects[future]
+                try:
+                    result = future.result()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Got an error while loading project %s', project)
+                    result = None
+                if future in snapshot_projects:
+                    snapshots[project] = result
+                    latest_tags[project] = result.latest_tag if result else None
+                else:
+                    latest_tags[project] = result
+                for p in [p for p in projects_to_yield if p in snapshots and all(q in latest_tags for q in self.get_tag_group_projects(p))]:
+                    projects_to_yield.remove(p)
+                    yield p, snapshots[p], self.get_latest_tag_group_tags(latest_tags).get(p.tag_group)
+        except FuturesTimeoutError:
+            logger.info('Did not load projects %s within the time budget', ', '.join(map(str, projects_to_yield)))
+
+    def render_project_card(
+        self,
+        project: Project,
+        snapshot: Optional[ProjectSnapshot],
+        latest_tag_group_tag: Optional[Tag],
+        position: int,
+        lazy_sections: bool = False,
+    ) -> str:
+        if snapshot is None:
+            return self.render_project_placeholder(project, position, is_loading=False)
+        return render_to_string('releases/project_card.html', {
             'gitlab_host': settings.GITLAB_HOST,
             'jira_host': settings.JIRA_HOST,
-            'projects': projects_context,
-            'warning_messages': warning_messages,
-        })
-        return context
-
-    def get_project_latest_tag(self, project: Project) -> Tuple[Project, Optional[Tag]]:
-        gitlab_client = GitlabClient()
-        return project, gitlab_client.get_latest_tag(project)
+            'project_context': self.get_project_context_data(project, snapshot, latest_tag_group_tag, position),
+            'lazy_sections': lazy_sections,
+        }, request=self.request)
+
+    def render_project_placeholder(self, project: Project, position: int, is_loading: bool) -> str:
+        """Render a card of a project that failed to load, or of one still loading, which the browser then fetches on its own"""
+        if is_loading:
+            return render_to_string('releases/project_placeholder.html', {
+                'project': project,
+                'position': position,
+                'message': 'Still loading, the project will show up as soon as it is ready.',
+                'fragment_url': reverse('releases:project-card', args=[project.gitlab_id]),
+            }, request=self.request)
+        return render_to_string('releases/project_placeholder.html', {
+            'project': project,
+            'position': position,
+            'message': 'Could not load the project, please try again later.',
+            'is_error': True,
+        }, request=self.request)
 
-    def get_project_context_data(self, project: Project, latest_tag: Optional[Tag], latest_tag_group_tag: Optional[Tag]):
+    def get_project_context_data(self, project: Project, snapshot: ProjectSnapshot, latest_tag_group_tag: Optional[Tag], position: int):
+        latest_tag = snapshot.latest_tag
         versioning_scheme = get_versioning_scheme(project.versioning_scheme)
         merge_requests_context = []
         has_awaiting_dev_merges = has_awaiting_maintenance_merges = has_awaiting_prod_merges = False
-        for merge_request in project.merge_requests:
-            changes = self.get_changes(project, merge_request.source_branch, merge_request.target_branch)
+        for merge_request, changes in zip(project.merge_requests, snapshot.merge_requests_changes):
             if changes and merge_request.merge_type == MergeRequest.MergeType.DEV:
                 has_awaiting_dev_merges = True
             if changes and merge_request.merge_type == MergeRequest.MergeType.MAINTENANCE:
@@ -136,7 +255,7 @@ class ReleasesView(TemplateView, ChangesGettingMixin):
                 },
                 versioning_scheme=versioning_scheme,
             ),
-            'tag_changes': self.get_changes(project, project.production_environment_branch, str(latest_tag)) if latest_tag else [],
+            'tag_changes': snapshot.tag_changes,
             'latest_tag': latest_tag,
             'tag_suggestions': versioning_scheme.get_tag_suggestions(tag_for_suggestions) if tag_for_suggestions else [],
             'other_projects_in_tag_group': [
@@ -146,9 +265,193 @@ class ReleasesView(TemplateView, ChangesGettingMixin):
             'has_awaiting_dev_merges': has_awaiting_dev_merges,
             'has_awaiting_maintenance_merges': has_awaiting_maintenance_merges,
             'has_awaiting_prod_merges': has_awaiting_prod_merges,
+            'snapshot': snapshot,
+            'position': position,
+            'refresh_project_form': ProjectForm(initial={'project_gitlab_id': project.gitlab_id}),
         }
 
 
+class ReleasesView(ProjectCardsMixin, TemplateView):
+
+    template_name = 'releases/releases.html'
+    project_cards_marker = '<!-- project cards -->'
+    project_filter_cookie_name = 'releases-project-filter'
+
+    def get(self, request, *args, **kwargs):
+        filter_query = self.get_filter_query()
+        filter_form = ProjectFilterForm(QueryDict(filter_query))
+        projects = filter_form.get_projects() if filter_form.is_valid() else settings.PROJECTS
+        context_kwargs = {'filter_form': filter_form, 'projects': projects}
+        deadline = self.get_deadline()
+        if settings.DASHBOARD_RENDERING == 'lazy':
+            response = super().get(request, *args, rendering='lazy', **context_kwargs, **kwargs)
+        else:
+            snapshot_tasks = self.get_snapshot_tasks(projects)
+            group_mates_latest_tag_tasks = self.get_group_mates_latest_tag_tasks(projects)
+            if settings.DASHBOARD_RENDERING == 'streaming':
+                response = self.get_streaming_response(snapshot_tasks, group_mates_latest_tag_tasks, deadline, context_kwargs)
+            else:
+                response = super().get(
+                    request,
+                    *args,
+                    rendering='full',
+                    snapshot_tasks=snapshot_tasks,
+                    group_mates_latest_tag_tasks=group_mates_latest_tag_tasks,
+                    deadline=deadline,
+                    **context_kwargs,
+                    **kwargs
+                )
+        if self.is_filter_requested():
+            if filter_query:
+                response.set_cookie(self.project_filter_cookie_name, filter_query, max_age=365 * 24 * 60 * 60)
+            else:
+                response.delete_cookie(self.project_filter_cookie_name)
+        return response
+
+    def is_filter_requested(self) -> bool:
+        return any(field_name in self.request.GET for field_name in ProjectFilterForm.base_fields)
+
+    def get_filter_query(self) -> str:
+        """Return the project filter from the query string, or the one saved in a cookie if not requested"""
+        if self.is_filter_requested():
+            filter_data = QueryDict(mutable=True)
+            for field_name in ProjectFilterForm.base_fields:
+                filter_data.setlist(field_name, [value for value in self.request.GET.getlist(field_name) if value])
+            return filter_data.urlencode()
+        return self.request.COOKIES.get(self.project_filter_cookie_name, '')
+
+    def get_context_data(
+        self,
+        rendering: str,
+        filter_form: ProjectFilterForm,
+        projects: List[Project],
+        snapshot_tasks: Optional[Dict[Project, Task]] = None,
+        group_mates_latest_tag_tasks: Optional[Dict[Project, Task]] = None,
+        deadline: Optional[float] = None,
+        **kwargs
+    ):
+        context = super().get_context_data()
+        warning_messages = []
+        if not JiraClient.is_configured_properly():
+            warning_messages.append('Jira configuration is not sufficient.')
+        if not RocketClient.is_configured_properly():
+            warning_messages.append('Rocket.chat configuration is not sufficient.')
+        if GitlabClient.is_degraded():
+            warning_messages.append('GitLab is degraded, projects may fail to load.')
+        if JiraClient.is_degraded():
+            warning_messages.append('Jira is degraded, Jira issues may be missing or outdated.')
+        if RocketClient.is_degraded():
+            warning_messages.append('Rocket.chat is degraded, notifications are not sent.')
+        if snapshot_tasks is None:
+            projects_context = [{'project': p, 'position': position} for position, p in enumerate(projects)]
+        else:
+            ready_projects = {
+                p: (snapshot, latest_tag_group_tag)
+                for p, snapshot, latest_tag_group_tag in self.iter_ready_projects(snapshot_tasks, group_mates_latest_tag_tasks, deadline)
+            }
+            projects_context = []
+            for position, p in enumerate(projects):
+                snapshot, latest_tag_group_tag = ready_projects.get(p, (None, None))
+                if snapshot:
+                    projects_context.append(self.get_project_context_data(p, snapshot, latest_tag_group_tag, position))
+                else:
+                    projects_context.append({
+                        'project': p,
+                        'position': position,
+                        'placeholder': self.render_project_placeholder(p, position, is_loading=p not in ready_projects),
+                    })
+        context.update({
+            'gitlab_host': settings.GITLAB_HOST,
+            'jira_host': settings.JIRA_HOST,
+            'projects': projects_context,
+            'all_projects_count': len(settings.PROJECTS),
+            'filter_form': filter_form,
+            'warning_messages': warning_messages,
+            'rendering': rendering,
+        })
+        return context
+
+    def get_streaming_response(
+        self,
+        snapshot_tasks: Dict[Project, Task],
+        group_mates_latest_tag_tasks: Dict[Project, Task],
+        deadline: Optional[float],
+        context_kwargs: dict,
+    ) -> StreamingHttpResponse:
+        """Send the page shell right away, followed by project cards in the order they get ready"""
+        get_token(self.request)  # the CSRF cookie has to be set before the response leaves the middleware
+        page = render_to_string(self.template_name, self.get_context_data(rendering='streaming', **context_kwargs), request=self.request)
+        page_head, page_tail = page.split(self.project_cards_marker, 1)
+        response = StreamingHttpResponse(
+            self.stream_page(page_head, snapshot_tasks, group_mates_latest_tag_tasks, deadline, page_tail),
+            content_type='text/html; charset=utf-8',
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream_page(
+        self,
+        page_head: str,
+        snapshot_tasks: Dict[Project, Task],
+        group_mates_latest_tag_tasks: Dict[Project, Task],
+        deadline: Optional[float],
+        page_tail: str,
+    ) -> Generator[str, None, None]:
+        yield page_head
+        positions = {p: position for position, p in enumerate(snapshot_tasks)}
+        projects_to_render = set(snapshot_tasks)
+        for p, snapshot, latest_tag_group_tag in self.iter_ready_projects(snapshot_tasks, group_mates_latest_tag_tasks, deadline):
+            projects_to_render.remove(p)
+            yield self.render_project_card(p, snapshot, latest_tag_group_tag, positions[p])
+            yield f'<script>showProjectBadges(\'{escapejs(p.gitlab_id)}\');</script>'
+        for p in sorted(projects_to_render, key=positions.get):
+            yield self.render_project_placeholder(p, positions[p], is_loading=True)
+        yield page_tail
+
+
+class ProjectCardView(ProjectCardsMixin, View):
+
+    def get(self, request, gitlab_id: str, *args, **kwargs):
+        project = self.get_project(gitlab_id)
+        position = settings.PROJECTS.index(project)
+        snapshot_task = self.get_snapshot_tasks([project])[project]
+        if not snapshot_task.done():
+            # the snapshot keeps building in the pool while the browser asks again later, rather than holding a worker until then
+            return HttpResponse(self.render_project_placeholder(project, position, is_loading=True))
+        ready_projects = list(self.iter_ready_projects(
+            {project: snapshot_task},
+            self.get_group_mates_latest_tag_tasks([project]),
+            self.get_deadline(),
+        ))
+        if not ready_projects:
+            return HttpResponse(self.render_project_placeholder(project, position, is_loading=True))
+        _, snapshot, latest_tag_group_tag = ready_projects[0]
+        return HttpResponse(self.render_project_card(project, snapshot, latest_tag_group_tag, position, lazy_sections=True))
+
+
+class ChangesFragmentView(ProjectCardsMixin, View):
+
+    def get(self, request, gitlab_id: str, *args, merge_request_index: Optional[int] = None, **kwargs):
+        project = self.get_project(gitlab_id)
+        try:
+            snapshot = self.get_snapshot_tasks([project])[project].result()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Got an error while loading project %s', project)
+            return HttpResponse('Could not load the project, please try again later.', status=503)
+        if merge_request_index is None:
+            changes = snapshot.tag_changes
+        elif merge_request_index < len(snapshot.merge_requests_changes):
+            changes = snapshot.merge_requests_changes[merge_request_index]
+        else:
+            raise Http404('Merge request not found.')
+        return render(request, 'releases/changes.html', {
+            'gitlab_host': settings.GITLAB_HOST,
+            'jira_host': settings.JIRA_HOST,
+            'project': project,
+            'changes': changes,
+        })
+
+
 class ProjectRedirectionMixin:
 
     @staticmethod
@@ -156,6 +459,31 @@ class ProjectRedirectionMixin:
         return HttpResponseRedirect(resolve_url('releases:releases') + f'#{project.gitlab_id}')
 
 
+class RefreshProjectView(FormView, ProjectRedirectionMixin):
+
+    form_class = ProjectForm
+
+    def form_valid(self, form: ProjectForm):
+        try:
+            project = next((project for project in settings.PROJECTS if project.gitlab_id == form.cleaned_data['project_gitlab_id']))
+        except StopIteration:
+            return redirect('releases:releases')
+        batch = get_executor().batch(max_pending=settings.EXECUTOR_REQUEST_CONCURRENCY)
+        snapshot_task = SnapshotBuilder().build_snapshots([project], batch)[project]
+        try:
+            snapshot_task.result()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception('Got an error while refreshing project %s', project)
+            messages.error(self.request, f'Could not refresh project {project}: {e}')
+        else:
+            messages.success(self.request, f'Refreshed project {project}.')
+        return self.redirect_to_project(project)
+
+    def form_invalid(self, form: ProjectForm):
+        messages.error(self.request, f'Invalid data: {form.errors}')
+        return redirect('releases:releases')
+
+
 class CreateMergeRequestView(FormView, ProjectRedirectionMixin):
 
     form_class = MergeRequestForm
@@ -181,6 +509,7 @@ class CreateMergeRequestView(FormView, ProjectRedirectionMixin):
             )
         else:
             messages.success(self.request, f'Created a merge request: {merge_request} in project {project}.')
+            SnapshotBuilder().invalidate_snapshot(project)
             try:
                 gitlab_client.merge_automatically(project, gitlab_merge_request.iid)
             except gitlab.exceptions.GitlabError:
@@ -219,7 +548,8 @@ class CreateTagView(FormView, ProjectRedirectionMixin, ChangesGettingMixin):
     def form_valid(self, form: TagForm):
         gitlab_client = GitlabClient()
         tag = Tag(major=form.cleaned_data['major'], minor=form.cleaned_data['minor'], patch=form.cleaned_data['patch'], fix=form.cleaned_data['fix'])
-        latest_tag = gitlab_client.get_latest_tag(self.project)
+        # the cached tag index may miss a tag created since it was built, which would add issues of an older release to this one
+        latest_tag = next(iter(gitlab_client.build_tag_index(self.project)), None)
         changes = self.get_changes(self.project, self.project.production_environment_branch, str(latest_tag)) if latest_tag else []
         try:
             gitlab_client.create_tag(self.project, tag)
@@ -229,6 +559,7 @@ class CreateTagView(FormView, ProjectRedirectionMixin, ChangesGettingMixin):
                 f'Could not create tag {tag} in project {self.project}. An error occurred while consuming the GitLab API: {e}'
             )
         else:
+            SnapshotBuilder().invalidate_snapshot(self.project)
             message = f'Created a tag {tag} ({self.versioning_scheme.get_tag_description(tag)}) in project {self.project}.'
             messages.success(self.request, message)
             rocket_client = RocketClient()
@@ -252,8 +583,7 @@ class CreateTagView(FormView, ProjectRedirectionMixin, ChangesGettingMixin):
         issues_with_fix_version, issues_without_fix_version = [], []
         issue_lists_by_success = {True: issues_with_fix_version, False: issues_without_fix_version}
         jira_issue_keys = {change.jira_issue.key for change in changes if change.jira_issue}
-        for jira_issue_key in jira_issue_keys:
-            adding_fix_version_succeeded = jira_client.add_fix_version(issue_key=jira_issue_key, fix_version=str(tag))
+        for jira_issue_key, adding_fix_version_succeeded in jira_client.add_fix_versions(jira_issue_keys, fix_version=str(tag)).items():
             issue_lists_by_success[adding_fix_version_succeeded].append(jira_issue_key)
         success_messages, error_messages = [], []
         if issues_with_fix_version:
@@ -267,7 +597,12 @@ class CreateTagView(FormView, ProjectRedirectionMixin, ChangesGettingMixin):
         return redirect('releases:releases')
 
 
-class PostDeploymentHookView(FormView, ChangesGettingMixin):
+class PostDeploymentHookView(FormView):
+
+    """Enqueue the production release Jira transitions of a deployed tag, the latest one by default, to be polled for by CI.
+
+    There is a single job per project and tag, so a retried request responds with the job enqueued by the first one.
+    """
 
     form_class = PostDeploymentHookForm
 
@@ -283,40 +618,112 @@ class PostDeploymentHookView(FormView, ChangesGettingMixin):
         if not project.production_release_jira_transitions:
             return HttpResponseBadRequest('Nothing to do for this project.')
 
-        gitlab_client = GitlabClient()
-        last_tags = gitlab_client.get_last_tags(project, tag_count=2)
-        if len(last_tags) != 2:
+        tags = GitlabClient().build_tag_index(project)  # the deployed tag may be too new for the cached index
+        if form.cleaned_data['tag']:
+            deployed_tags = GitlabClient.parse_tags([form.cleaned_data['tag']])
+            if not deployed_tags or deployed_tags[0] not in tags:
+                return HttpResponseBadRequest('Tag not found.')
+            tags = tags[tags.index(deployed_tags[0]):]
+        if len(tags) < 2:
             return HttpResponseBadRequest('Need at least two tags in the repository to handle changes.')
-        latest_tag, previous_tag = last_tags
-        changes = self.get_changes(project, str(latest_tag), str(previous_tag))
-        success_messages, error_messages = self.transition_jira_issues(project, changes)
-
-        rocket_client = RocketClient()
-        if error_messages:
-            message = f'Post deployment hook for {project} failed.\n' + '\n'.join(success_messages + error_messages)
-            rocket_client.send_message(message, color='red')
-            return HttpResponse(message)
-        message = f'Post deployment hook for {project} succeeded.\n' + '\n'.join(success_messages)
-        rocket_client.send_message(message, color='green')
-        return HttpResponse(message)
-
-    def transition_jira_issues(self, project: Project, changes: List[Change]) -> Tuple[List[str], List[str]]:
-        jira_client = JiraClient()
-        issues_with_transitions, issues_without_transitions = [], []
-        issue_lists_by_success = {True: issues_with_transitions, False: issues_without_transitions}
-        jira_issue_keys = {change.jira_issue.key for change in changes if change.jira_issue}
-        for jira_issue_key in jira_issue_keys:
-            transitions_succeeded = bool(jira_client.make_transitions(
-                issue_key=jira_issue_key,
-                transition_names=project.production_release_jira_transitions,
-            ))
-            issue_lists_by_success[transitions_succeeded].append(jira_issue_key)
-        success_messages, error_messages = [], []
-        if issues_with_transitions:
-            success_messages.append(f"Successfully transitioned issues: {', '.join(issues_with_transitions)}.")
-        if issues_without_transitions:
-            error_messages.append(f"Could not transition issues: {', '.join(issues_without_transitions)}. Please handle it manually.")
-        return success_messages, error_messages
+        deployed_tag, previous_tag = tags[:2]
+
+        job, _ = PostDeploymentHook().enqueue(project, str(deployed_tag), str(previous_tag))
+        return render_post_deployment_job(job)
 
     def form_invalid(self, form):
         return HttpResponseBadRequest('Invalid request data.')
+
+
+class PostDeploymentJobView(View):
+
+    def get(self, request, job_id: str, *args, **kwargs):
+        job = get_post_deployment_job_store().get(job_id)
+        if job is None:
+            raise Http404(f'Post deployment job {job_id} not found.')
+        PostDeploymentHook().resume_if_stale(job)
+        return render_post_deployment_job(job)
+
+
+def render_post_deployment_job(job: PostDeploymentJob) -> JsonResponse:
+    """Respond with the job, as accepted until it is finished"""
+    return JsonResponse(
+        {
+            'job_id': job.job_id,
+            'project_gitlab_id': job.project_gitlab_id,
+            'tag': job.tag,
+            'previous_tag': job.previous_tag,
+            'status': job.status,
+            'message': job.message,
+            'status_url': reverse('releases:post-deployment-job', kwargs={'job_id': job.job_id}),
+        },
+        status=200 if job.is_finished else 202,
+    )
+
+
+class CacheStatsView(View):
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'pid': os.getpid(),
+            'backend': get_backend_stats(),
+            'namespaces': get_cache_stats(),
+            'single_flight': get_single_flight_stats(),
+            'throttling': get_throttling_stats(),
+            'circuit_breakers': get_circuit_breaker_stats(),
+        })
+
+
+class GitlabWebhookView(View):
+
+    """Keep cached branch heads up to date with GitLab push, tag push and merge request events and rebuild affected snapshots."""
+
+    DELETED_REF_SHA = '0' * 40
+
+    def post(self, request, *args, **kwargs):
+        token = request.META.get('HTTP_X_GITLAB_TOKEN', '')
+        if not settings.GITLAB_WEBHOOK_SECRET_TOKEN or not hmac.compare_digest(token, settings.GITLAB_WEBHOOK_SECRET_TOKEN):
+            return HttpResponseForbidden('Invalid token.')
+        try:
+            payload = json.loads(request.body.decode())
+            gitlab_id = payload['project']['path_with_namespace']
+            object_kind = payload['object_kind']
+            if object_kind in ('push', 'tag_push'):
+                ref = re.sub('^refs/(heads|tags)/', '', payload['ref'])
+                is_deleted = payload['after'] == self.DELETED_REF_SHA
+                # after of an annotated tag is the SHA of the tag object, checkout_sha the SHA of the tagged commit
+                sha = payload.get('checkout_sha') if object_kind == 'tag_push' else payload['after']
+            elif object_kind == 'merge_request':
+                branches = {payload['object_attributes']['source_branch'], payload['object_attributes']['target_branch']}
+        except (ValueError, KeyError, TypeError):
+            return HttpResponseBadRequest('Invalid request data.')
+        project = next((project for project in settings.PROJECTS if project.gitlab_id == gitlab_id), None)
+        if not project:
+            return HttpResponse('Nothing to do for this project.')
+
+        gitlab_client = GitlabClient()
+        if object_kind in ('push', 'tag_push'):
+            if is_deleted or not sha:
+                gitlab_client.forget_ref(project, ref)
+            else:
+                gitlab_client.remember_ref(project, ref, sha)
+            if object_kind == 'tag_push':
+                gitlab_client.update_tag_index(project, ref, deleted=is_deleted)
+            is_relevant = object_kind == 'tag_push' or ref in self.get_project_branches(project)
+        elif object_kind == 'merge_request':
+            for branch in branches:
+                gitlab_client.forget_ref(project, branch)
+            is_relevant = bool(branches & self.get_project_branches(project))
+        else:
+            return HttpResponse('Nothing to do for this event.')
+
+        if is_relevant:
+            SnapshotBuilder().rebuild_snapshots_in_background([project])
+        return HttpResponse('OK')
+
+    @staticmethod
+    def get_project_branches(project: Project) -> Set[str]:
+        branches = {project.production_environment_branch}
+        for merge_request in project.merge_requests:
+            branches |= {merge_request.source_branch, merge_request.target_branch}
+        return branches
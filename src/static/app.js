@@ -8,8 +8,21 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   });
 
+  const fetchFragment = url => fetch(url, {credentials: 'same-origin'}).then(response => {
+    if (!response.ok) {
+      throw new Error(`Could not load ${url}: ${response.status}`);
+    }
+    return response.text();
+  });
+
+  const initForm = form => {
+    form.addEventListener('submit', e => {
+      document.querySelector('.progress-modal').classList.add('is-active');
+    });
+  };
+
   // project card
-  document.querySelectorAll('.project-card').forEach(projectCard => {
+  const initProjectCard = projectCard => {
     projectCard.querySelectorAll('.tag-suggestion').forEach(tagSuggestion => {
       tagSuggestion.addEventListener('click', e => {
         e.preventDefault();
@@ -18,12 +31,55 @@ document.addEventListener('DOMContentLoaded', () => {
         projectCard.querySelector('[name=patch]').setAttribute('value', tagSuggestion.getAttribute('data-patch'));
         projectCard.querySelector('[name=fix]').setAttribute('value', tagSuggestion.getAttribute('data-fix'));
       });
-    })
-  });
+    });
 
-  document.querySelectorAll('form').forEach(form => {
-    form.addEventListener('submit', e => {
-      document.querySelector('.progress-modal').classList.add('is-active');
+    // sections fetched when expanded for the first time
+    projectCard.querySelectorAll('details.lazy-fragment').forEach(details => {
+      details.addEventListener('toggle', () => {
+        if (!details.open || details.classList.contains('is-loaded')) {
+          return;
+        }
+        details.classList.add('is-loaded');
+        const progress = details.querySelector('progress');
+        fetchFragment(details.getAttribute('data-fragment-url')).then(html => {
+          progress.outerHTML = html;
+        }).catch(() => {
+          // fetched again when expanded next time
+          details.classList.remove('is-loaded');
+          details.querySelectorAll('.fragment-error').forEach(error => error.parentNode.removeChild(error));
+          progress.insertAdjacentHTML('beforebegin', '<div class="notification is-size-7 is-danger fragment-error">Could not load the changes, please try again later.</div>');
+        });
+      });
     });
-  })
+  };
+
+  document.querySelectorAll('.project-card').forEach(initProjectCard);
+  document.querySelectorAll('form').forEach(initForm);
+
+  // project cards fetched by the browser, see DASHBOARD_RENDERING and DASHBOARD_TIME_BUDGET
+  const maxProjectCardDelay = 30000;
+  const loadProjectCard = (placeholder, delay = 1000) => {
+    fetchFragment(placeholder.getAttribute('data-fragment-url')).then(html => {
+      const template = document.createElement('template');
+      template.innerHTML = html.trim();
+      const projectCardContainer = template.content.firstElementChild;
+      placeholder.parentNode.replaceChild(projectCardContainer, placeholder);
+      if (projectCardContainer.classList.contains('project-card-placeholder')) {
+        // still loading, asked for again less and less often
+        setTimeout(() => loadProjectCard(projectCardContainer, Math.min(delay * 2, maxProjectCardDelay)), delay);
+        return;
+      }
+      projectCardContainer.querySelectorAll('.project-card').forEach(initProjectCard);
+      projectCardContainer.querySelectorAll('form').forEach(initForm);
+      const cardBadges = projectCardContainer.querySelector('.project-card-badges');
+      const menuBadges = document.querySelector(`.project-menu-badges[data-project="${projectCardContainer.id}"]`);
+      if (cardBadges && menuBadges) {
+        menuBadges.innerHTML = cardBadges.innerHTML;
+      }
+    }).catch(() => {
+      placeholder.querySelector('.card-content').innerHTML = '<div class="notification is-size-7 is-danger">Could not load the project, please try again later.</div>';
+    });
+  };
+
+  document.querySelectorAll('.project-card-placeholder').forEach(placeholder => loadProjectCard(placeholder));
 });